@@ -5,14 +5,57 @@ Email Agent Client - MCP Powered Version
 import asyncio
 import json
 import os
-from groq import Groq
+from groq import AsyncGroq
 from dotenv import load_dotenv
 from mcp_client import MCPEmailClient
 
+# orjson parses the LLM's JSON decisions faster; fall back to stdlib json.
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so one except
+# clause handles both
+try:
+    import orjson as _json
+except ImportError:
+    _json = json
+
+# uvloop is a faster drop-in event loop (not available on Windows)
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
 # Load environment
 load_dotenv()
 
 
+# System prompt text around the tool list (plain strings, no formatting)
+_PROMPT_HEADER = """You are an email assistant with access to these MCP tools:
+
+"""
+
+_PROMPT_INSTRUCTIONS = """
+
+IMPORTANT INSTRUCTIONS:
+1. For draft replies: Use draft_gmail_reply or draft_icloud_reply tools. The agent will handle user approval.
+2. When user says "draft a reply to X", first find the email, then use the draft tool with AI-generated reply text.
+3. For searches: Use search_gmail with Gmail query syntax (from:, subject:, is:unread, etc.)
+4. Always be helpful and professional in generated email text.
+
+When the user asks you to do something, respond with a JSON object:
+{
+    "action": "call_tool" or "respond",
+    "tool": "tool_name",
+    "params": {},
+    "message": "what to tell the user"
+}
+
+Examples:
+User: "draft a reply to john's email"
+{"action": "call_tool", "tool": "search_gmail", "params": {"query": "from:john", "max_results": 1}, "message": "Finding John's email..."}
+Then: {"action": "call_tool", "tool": "draft_gmail_reply", "params": {"email_id": "xxx", "reply_body": "AI-generated professional reply"}, "message": "Drafting reply..."}
+
+Always respond with valid JSON only."""
+
+
 class EmailAgent:
     """
     Email agent powered by MCP and Groq.
@@ -22,22 +65,33 @@ class EmailAgent:
     """
     
     def __init__(self):
-        self.groq_client = Groq(api_key=os.getenv('GROQ_API_KEY'))
+        # Async client so the LLM call doesn't block the event loop
+        self.groq_client = AsyncGroq(api_key=os.getenv('GROQ_API_KEY'))
         self.mcp_client = None
         self.conversation_history = []
         self.available_tools = []
         self.pending_draft = None
+        self.system_prompt = ""
     
     async def connect_mcp(self):
         """Connect to MCP server and get available tools."""
-        self.mcp_client = await MCPEmailClient().__aenter__()
+        self.mcp_client = MCPEmailClient()
+        await self.mcp_client.connect()
         self.available_tools = self.mcp_client.available_tools
+
+        # Tools don't change while connected, so build the prompt once
+        tools_desc = "\n".join([
+            f"- {tool.name}: {tool.description}"
+            for tool in self.available_tools
+        ])
+        self.system_prompt = "".join((_PROMPT_HEADER, tools_desc, _PROMPT_INSTRUCTIONS))
+
         return self.mcp_client
     
     async def cleanup_mcp(self):
         """Cleanup MCP connection."""
         if self.mcp_client:
-            await self.mcp_client.__aexit__(None, None, None)
+            await self.mcp_client.close()
     
     async def process_command(self, user_input: str) -> str:
         """
@@ -95,43 +149,11 @@ class EmailAgent:
             "content": user_input
         })
         
-        # Build tool descriptions for Groq
-        tools_desc = "\n".join([
-            f"- {tool.name}: {tool.description}"
-            for tool in self.available_tools
-        ])
-        
-        # System prompt
-        system_prompt = f"""You are an email assistant with access to these MCP tools:
-
-{tools_desc}
-
-IMPORTANT INSTRUCTIONS:
-1. For draft replies: Use draft_gmail_reply or draft_icloud_reply tools. The agent will handle user approval.
-2. When user says "draft a reply to X", first find the email, then use the draft tool with AI-generated reply text.
-3. For searches: Use search_gmail with Gmail query syntax (from:, subject:, is:unread, etc.)
-4. Always be helpful and professional in generated email text.
-
-When the user asks you to do something, respond with a JSON object:
-{{
-    "action": "call_tool" or "respond",
-    "tool": "tool_name",
-    "params": {{}},
-    "message": "what to tell the user"
-}}
-
-Examples:
-User: "draft a reply to john's email"
-{{"action": "call_tool", "tool": "search_gmail", "params": {{"query": "from:john", "max_results": 1}}, "message": "Finding John's email..."}}
-Then: {{"action": "call_tool", "tool": "draft_gmail_reply", "params": {{"email_id": "xxx", "reply_body": "AI-generated professional reply"}}, "message": "Drafting reply..."}}
-
-Always respond with valid JSON only."""
-
         # Call Groq
-        response = self.groq_client.chat.completions.create(
+        response = await self.groq_client.chat.completions.create(
             model="llama-3.3-70b-versatile",
             messages=[
-                {"role": "system", "content": system_prompt},
+                {"role": "system", "content": self.system_prompt},
                 *self.conversation_history
             ],
             temperature=0.3,
@@ -142,7 +164,7 @@ Always respond with valid JSON only."""
         
         # Parse and execute
         try:
-            command = json.loads(assistant_response)
+            command = _json.loads(assistant_response)
             
             if command.get("action") == "call_tool":
                 # Call MCP tool
@@ -268,11 +290,10 @@ async def main():
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        if uvloop:
+            uvloop.run(main())
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
         # Final catch for any Ctrl+C
-        print("\n👋 Exited cleanly!")
-
-
-if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+        print("\n👋 Exited cleanly!")
\ No newline at end of file
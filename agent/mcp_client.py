@@ -4,21 +4,52 @@ MCP Client for Email Agent - Clean Version
 
 import asyncio
 import sys
-import json
+from contextlib import AsyncExitStack
 from pathlib import Path
+
+import anyio
+
+# orjson decodes large tool results much faster; fall back to stdlib json
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 
 
+# Raised when the request couldn't be written because the server process
+# is gone - nothing was delivered, so reconnecting and retrying is safe
+_DISCONNECT_ERRORS = (
+    anyio.ClosedResourceError,
+    anyio.BrokenResourceError,
+    BrokenPipeError,
+    ConnectionError,
+)
+
+# Reconnect attempts per call, waiting RECONNECT_DELAY * 2**attempt before each
+RECONNECT_ATTEMPTS = 3
+RECONNECT_DELAY = 0.5
+
+
 class MCPEmailClient:
     """
     MCP client that connects to the email server.
+    
+    Holds one long-lived session and reconnects (with backoff) if the
+    server process goes away.
     """
     
     def __init__(self):
         self.session = None
         self.available_tools = []
-        self._exit_stack = []
+        self._task = None
+        self._stop = None
+        self._closed = True
+        self._reconnect_lock = asyncio.Lock()
+        # Called with the tool list after every (re)connect, so callers can
+        # rebuild anything derived from it
+        self.on_tools_changed = None
         
     async def __aenter__(self):
         """
@@ -28,6 +59,30 @@ class MCPEmailClient:
             async with MCPEmailClient() as client:
                 result = await client.call_tool("list_gmail_emails")
         """
+        await self.connect()
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """
+        Async context manager exit - cleanup.
+        """
+        await self.close()
+    
+    async def connect(self):
+        """
+        Start the server and open a session.
+        
+        The session's contexts are entered and exited by one background
+        task (anyio requires the same task for both), which keeps them
+        open until close().
+        """
+        self._closed = False
+        await self._open()
+    
+    async def _open(self):
+        """
+        Start the server session task and wait until it is ready.
+        """
         # Get path to server script
         project_root = Path(__file__).parent.parent
         server_script = project_root / "mcp_server" / "server.py"
@@ -42,37 +97,74 @@ class MCPEmailClient:
             env=None
         )
         
-        # Start server (using context manager properly)
-        self._stdio_context = stdio_client(server_params)
-        read, write = await self._stdio_context.__aenter__()
-        
-        # Create session
-        self._session_context = ClientSession(read, write)
-        self.session = await self._session_context.__aenter__()
-        
-        # Initialize
-        await self.session.initialize()
-        
-        # Get tools
-        response = await self.session.list_tools()
-        self.available_tools = response.tools
+        ready = asyncio.get_running_loop().create_future()
+        self._stop = asyncio.Event()
+        self._task = asyncio.create_task(self._run_session(server_params, ready, self._stop))
+        self.session, self.available_tools = await ready
+        if self.on_tools_changed:
+            self.on_tools_changed(self.available_tools)
         
         print(f"✅ Connected to MCP server")
         print(f"📧 Available tools: {len(self.available_tools)}")
         for tool in self.available_tools:
             print(f"   - {tool.name}")
-        
-        return self
     
-    async def __aexit__(self, exc_type, exc_val, exc_tb):
+    async def _run_session(self, server_params, ready, stop):
         """
-        Async context manager exit - cleanup.
+        Own the server process and session until stop is set.
+        """
+        try:
+            async with AsyncExitStack() as stack:
+                read, write = await stack.enter_async_context(stdio_client(server_params))
+                session = await stack.enter_async_context(ClientSession(read, write))
+                
+                await session.initialize()
+                response = await session.list_tools()
+                
+                ready.set_result((session, response.tools))
+                await stop.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                # Calls will fail and trigger a reconnect
+                print(f"⚠️ MCP session ended: {e}")
+    
+    async def close(self):
+        """
+        Close the session and stop the server.
         """
-        # Cleanup in reverse order
-        if self._session_context:
-            await self._session_context.__aexit__(exc_type, exc_val, exc_tb)
-        if self._stdio_context:
-            await self._stdio_context.__aexit__(exc_type, exc_val, exc_tb)
+        self._closed = True
+        await self._disconnect()
+    
+    async def _disconnect(self):
+        """
+        Stop the session task (which closes the session and server).
+        """
+        task, self._task = self._task, None
+        self.session = None
+        if task:
+            self._stop.set()
+            await task
+    
+    async def _reconnect(self, stale_session, attempt: int):
+        """
+        Replace a dead session, unless another caller already has.
+        """
+        async with self._reconnect_lock:
+            if self.session is not stale_session:
+                return
+            
+            delay = RECONNECT_DELAY * 2 ** attempt
+            print(f"🔌 MCP server disconnected - reconnecting in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            await self._disconnect()
+            # close() may have been called while we were backing off
+            if self._closed:
+                return
+            await self._open()
+            if self._closed:
+                await self._disconnect()
     
     async def call_tool(self, tool_name: str, **kwargs):
         """
@@ -85,15 +177,56 @@ class MCPEmailClient:
         Returns:
             Tool result (parsed from JSON)
         """
-        if not self.session:
+        if self._closed:
             raise RuntimeError("Client not connected. Use 'async with MCPEmailClient()' pattern")
         
-        # Call the tool
-        result = await self.session.call_tool(tool_name, arguments=kwargs)
+        for attempt in range(RECONNECT_ATTEMPTS + 1):
+            session = self.session
+            try:
+                if session is None:
+                    # An earlier reconnect failed; try again
+                    raise ConnectionError("MCP session is down")
+                result = await session.call_tool(tool_name, arguments=kwargs)
+                return self._parse_result(result)
+            except _DISCONNECT_ERRORS:
+                if attempt == RECONNECT_ATTEMPTS or self._closed:
+                    raise
+                try:
+                    await self._reconnect(session, attempt)
+                except Exception as e:
+                    print(f"❌ MCP reconnect failed: {e}")
+    
+    async def call_tools(self, specs: list[tuple[str, dict]]) -> list:
+        """
+        Call several independent tools concurrently over the same session.
         
-        # Parse the result
+        Usage:
+            gmail, icloud = await client.call_tools([
+                ("list_gmail_emails", {"max_results": 5}),
+                ("list_icloud_emails", {"max_results": 5}),
+            ])
+        
+        Args:
+            specs: List of (tool_name, arguments) pairs
+        
+        Returns:
+            Results in the same order as specs. A call that raised is
+            returned as the exception instead of a result.
+        """
+        if self._closed:
+            raise RuntimeError("Client not connected. Use 'async with MCPEmailClient()' pattern")
+        
+        return await asyncio.gather(
+            *(self.call_tool(name, **args) for name, args in specs),
+            return_exceptions=True
+        )
+    
+    def _parse_result(self, result):
+        """
+        Parse the JSON text content of a tool result.
+        """
         if result.content:
             text = result.content[0].text
-            return json.loads(text)
+            return _json.loads(text)
         
-        return None
\ No newline at end of file
+        return None
@@ -1,11 +1,15 @@
+import errno
 import os
 import pickle
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import cached_property, lru_cache
 import base64
-from email.mime.text import MIMEText
+import binascii
+from email.header import Header
+from email.utils import formataddr, parseaddr
 
 # Gmail API scopes - permissions needed
 SCOPES = [
@@ -13,23 +17,200 @@ SCOPES = [
     "https://www.googleapis.com/auth/gmail.send",
 ]
 
+# Gmail accepts up to 100 calls per batch request, but recommends at most 50:
+# larger batches hit per-message rateLimitExceeded errors
+BATCH_SIZE = 50
+# Seconds to wait before retrying the messages a batch failed to fetch
+BATCH_RETRY_DELAY = 1.0
+
+# OAuth token storage (token.pickle is only read to migrate old installs).
+# Docker points GMAIL_TOKEN_PATH into a mounted data directory
+TOKEN_PATH = os.getenv("GMAIL_TOKEN_PATH", "token.json")
+LEGACY_TOKEN_PATH = os.path.join(os.path.dirname(TOKEN_PATH), "token.pickle")
+
+# Credentials and Gmail service shared by every GmailHandler in the process
+_CREDS_CACHE = None
+_SERVICE_CACHE = None
+_AUTH_LOCK = threading.Lock()
+
+# Refresh the access token this many seconds before it expires
+CREDS_REFRESH_MARGIN = 300
+
+# Per-thread authorised HTTP connections (httplib2.Http isn't thread-safe)
+_HTTP_LOCAL = threading.local()
+HTTP_TIMEOUT = 30
+
+# Read-only requests are retried (with exponential backoff) on 429/5xx and
+# dropped connections. Sends are never retried, to avoid duplicate mail.
+NUM_RETRIES = 3
+
+
+# Headers for a single-part UTF-8 plain-text message
+_PLAIN_MESSAGE_TEMPLATE = (
+    "To: {to}\r\n"
+    "Subject: {subject}\r\n"
+    "MIME-Version: 1.0\r\n"
+    "Content-Type: text/plain; charset=utf-8\r\n"
+    "Content-Transfer-Encoding: 8bit\r\n"
+    "\r\n"
+    "{body}"
+)
+
+
+def _header_value(value, address=False):
+    """
+    Make a value safe to put in a raw message header.
+
+    CR/LF are replaced so the value can't inject extra headers, and
+    non-ASCII text is RFC 2047 encoded.
+    """
+    value = value.replace("\r", " ").replace("\n", " ")
+    if value.isascii():
+        return value
+    if address:
+        return formataddr(parseaddr(value), charset="utf-8")
+    return Header(value, "utf-8").encode()
+
+
+# Read emails are cached for an hour (message contents never change)
+READ_CACHE_SIZE = 512
+READ_CACHE_TTL = 3600
+
+# Repeated searches within this window reuse the previous result list
+SEARCH_CACHE_SIZE = 64
+SEARCH_CACHE_TTL = 60
+
+
+class TTLCache:
+    """
+    Small thread-safe LRU cache whose entries expire after `ttl` seconds.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Return the cached value, or None if missing or expired.
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """
+        Store a value, evicting the least recently used entry when full.
+        """
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        """
+        Remove a key if present.
+        """
+        with self._lock:
+            self._data.pop(key, None)
+
+
+# Maps base64url to standard base64 so binascii can decode it directly
+_URLSAFE_TRANS = bytes.maketrans(b"-_", b"+/")
+
+
+def _decode_b64url(data):
+    """
+    Decode Gmail's base64url body data with the C decoder.
+
+    Gmail sometimes omits the trailing "=" padding, which a2b_base64
+    rejects, so it is restored here.
+    """
+    if isinstance(data, str):
+        data = data.encode("ascii")
+
+    pad = -len(data) % 4
+    if pad:
+        data += b"=" * pad
+
+    return binascii.a2b_base64(data.translate(_URLSAFE_TRANS))
+
+
+# Headers we show for each Gmail message
+_HDR_KEYS = ("From", "Subject", "Date")
+_WANTED = frozenset(_HDR_KEYS)
+
+
+def _extract_headers(headers):
+    """
+    Pick the From/Subject/Date values out of a Gmail header list in one pass.
+    """
+    out = {}
+    for h in headers:
+        name = h["name"]
+        if name in _WANTED:
+            out[name] = h["value"]
+    return out
+
 
 class GmailHandler:
     def __init__(self, credentials_path="credentials.json"):
         self.credentials_path = credentials_path
-        self.service = None
-        self._authenticate()
+        self._read_cache = TTLCache(maxsize=READ_CACHE_SIZE, ttl=READ_CACHE_TTL)
+        self._search_cache = TTLCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL)
+
+    @cached_property
+    def service(self):
+        """
+        The Gmail API service, authenticated on first use.
+        """
+        return self._authenticate()
 
     def _authenticate(self):
         """
         Handles OAuth 2.0 authentication with Gmail.
+
+        Credentials and the built service are cached at module level, so
+        only the first handler in a process touches the token file.
+        """
+        with _AUTH_LOCK:
+            return self._load_service()
+
+    def _load_service(self):
+        """
+        Return the shared Gmail service, authenticating on first use.
+
+        Must be called with _AUTH_LOCK held.
         """
-        creds = None
+        global _CREDS_CACHE, _SERVICE_CACHE
+
+        # The Google client stack is slow to import, so load it only once
+        # the server actually needs Gmail
+        from google.auth.transport.requests import Request
+        from google_auth_oauthlib.flow import InstalledAppFlow
+        from googleapiclient.discovery import build
+
+        # Reuse credentials already loaded by this process
+        if _CREDS_CACHE is not None and _CREDS_CACHE.valid and _SERVICE_CACHE is not None:
+            return _SERVICE_CACHE
+
+        creds = _CREDS_CACHE
 
         # Check for saved credentials
-        if os.path.exists("token.pickle"):
-            with open("token.pickle", "rb") as token:
-                creds = pickle.load(token)
+        if creds is None:
+            creds = self._load_saved_creds()
 
         # If no valid credentials, get new ones
         if not creds or not creds.valid:
@@ -44,71 +225,232 @@ class GmailHandler:
                 creds = flow.run_local_server(port=0)
 
             # Save credentials for next time
-            with open("token.pickle", "wb") as token:
-                pickle.dump(creds, token)
+            self._save_token(creds)
+
+        # Build the Gmail service once and share it. The discovery document
+        # bundled with googleapiclient is used, so no HTTP fetch is needed.
+        if _SERVICE_CACHE is None or creds is not _CREDS_CACHE:
+            _SERVICE_CACHE = build(
+                "gmail",
+                "v1",
+                credentials=creds,
+                static_discovery=True,
+                cache_discovery=False,
+            )
+        _CREDS_CACHE = creds
+        return _SERVICE_CACHE
+
+    def _load_saved_creds(self):
+        """
+        Load credentials from the token file, or None if there isn't one.
+
+        Must be called with _AUTH_LOCK held.
+        """
+        from google.oauth2.credentials import Credentials
+
+        # isfile: Docker creates a missing bind-mount source as a directory
+        if os.path.isfile(TOKEN_PATH):
+            return Credentials.from_authorized_user_file(TOKEN_PATH, SCOPES)
+        if os.path.isfile(LEGACY_TOKEN_PATH):
+            # One-time migration from the old pickle token
+            with open(LEGACY_TOKEN_PATH, "rb") as token:
+                creds = pickle.load(token)
+            self._save_token(creds)
+            return creds
+        return None
+
+    def can_authenticate_silently(self):
+        """
+        Whether Gmail can be used without the interactive OAuth flow: a
+        saved token that is still valid or can be refreshed.
+        """
+        global _CREDS_CACHE
 
-        # Build the Gmail service
-        self.service = build("gmail", "v1", credentials=creds)
+        with _AUTH_LOCK:
+            if _CREDS_CACHE is None:
+                _CREDS_CACHE = self._load_saved_creds()
+            creds = _CREDS_CACHE
+        return bool(creds and (creds.valid or (creds.expired and creds.refresh_token)))
+
+    def _save_token(self, creds):
+        """
+        Persist credentials as JSON for the next run.
+
+        Written to a temp file and swapped in with os.replace, so a crash
+        or a concurrent writer never leaves a half-written token behind.
+        A token file bind-mounted on its own (Docker) can't be replaced,
+        so it is overwritten in place instead.
+        """
+        data = creds.to_json()
+        tmp_path = f"{TOKEN_PATH}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as token:
+                token.write(data)
+            os.replace(tmp_path, TOKEN_PATH)
+        except OSError as e:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            if e.errno not in (errno.EBUSY, errno.EXDEV):
+                raise
+            with open(TOKEN_PATH, "w") as token:
+                token.write(data)
+
+    def refresh_credentials(self, margin=CREDS_REFRESH_MARGIN):
+        """
+        Refresh the shared credentials if they expire within `margin` seconds.
+
+        Called periodically from the server so tool calls never stop to
+        refresh an expired token themselves.
+        """
+        from google.auth.transport.requests import Request
+
+        # Never start the browser sign-in from a background task
+        if not self.can_authenticate_silently():
+            return
+
+        self.service  # Make sure credentials are loaded
+
+        with _AUTH_LOCK:
+            creds = _CREDS_CACHE
+            if creds is None or not creds.refresh_token or creds.expiry is None:
+                return
+
+            # google-auth stores expiry as a naive UTC datetime
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            if (creds.expiry - now).total_seconds() > margin:
+                return
+
+            creds.refresh(Request())
+            self._save_token(creds)
+
+    def _http(self):
+        """
+        Return this thread's authorised keep-alive HTTP connection.
+
+        The service object is shared, but each worker thread executes its
+        requests over its own connection so calls can run concurrently.
+        """
+        self.service  # Make sure credentials are loaded
+
+        if getattr(_HTTP_LOCAL, "creds", None) is not _CREDS_CACHE:
+            import httplib2
+            from google_auth_httplib2 import AuthorizedHttp
+
+            _HTTP_LOCAL.http = AuthorizedHttp(
+                _CREDS_CACHE, http=httplib2.Http(timeout=HTTP_TIMEOUT)
+            )
+            _HTTP_LOCAL.creds = _CREDS_CACHE
+        return _HTTP_LOCAL.http
+
+    def prewarm(self):
+        """
+        Make a cheap API call so the HTTPS connection is already open
+        when the first real request arrives.
+
+        Returns False without doing anything if signing in would need the
+        interactive OAuth flow; that is left to the first real request.
+        """
+        if not self.can_authenticate_silently():
+            return False
+        self.service.users().getProfile(userId="me").execute(http=self._http())
+        return True
 
     def list_emails(self, max_results=10, query=""):
         """
         Fetch a list of emails from inbox.
         """
         try:
-            # Get list of message IDs
-            results = (
-                self.service.users()
-                .messages()
-                .list(
-                    userId="me",
-                    maxResults=max_results,
-                    q=query,  # Gmail search syntax
-                )
-                .execute()
+            return list(self.iter_emails(max_results=max_results, query=query))
+
+        except Exception as e:
+            return {"error": str(e)}
+
+    def iter_emails(self, max_results=10, query=""):
+        """
+        Yield email metadata newest first, one batch request at a time.
+
+        Callers that only need the first few emails can stop iterating
+        early and skip the remaining batch requests. Errors are raised
+        rather than returned as {"error": ...}.
+        """
+        # Get list of message IDs
+        results = (
+            self.service.users()
+            .messages()
+            .list(
+                userId="me",
+                maxResults=max_results,
+                q=query,  # Gmail search syntax
             )
+            .execute(http=self._http(), num_retries=NUM_RETRIES)
+        )
 
-            messages = results.get("messages", [])
-
-            if not messages:
-                return []
-
-            # Fetch details for each message
-            email_list = []
-            for message in messages:
-                msg = (
-                    self.service.users()
-                    .messages()
-                    .get(
-                        userId="me",
-                        id=message["id"],
-                        format="metadata",  # Only get headers, not full body
-                        metadataHeaders=["From", "Subject", "Date"],
-                    )
-                    .execute()
-                )
+        messages = results.get("messages", [])
+
+        # Fetch details using the batch endpoint
+        # (one HTTP round trip per BATCH_SIZE messages instead of one each)
+        for start in range(0, len(messages), BATCH_SIZE):
+            chunk = messages[start:start + BATCH_SIZE]
+            fetched, failed = self._get_metadata([message["id"] for message in chunk])
+
+            if failed:
+                # Usually per-message 429s - back off and retry those once
+                time.sleep(BATCH_RETRY_DELAY)
+                retried, failed = self._get_metadata(list(failed))
+                fetched.update(retried)
+                if failed:
+                    raise next(iter(failed.values()))
 
-                # Extract headers
-                headers = msg["payload"]["headers"]
-                email_data = {
+            # Yield in the original (newest first) order
+            for message in chunk:
+                msg = fetched.get(message["id"])
+                if msg is None:
+                    continue
+
+                # format="metadata" only returns the requested headers, so
+                # no filtering is needed (their order isn't guaranteed,
+                # and missing ones are simply absent, so key by name)
+                headers = {h["name"]: h["value"] for h in msg["payload"]["headers"]}
+                yield {
                     "id": msg["id"],
                     "snippet": msg.get("snippet", ""),  # Preview text
-                    "from": next(
-                        (h["value"] for h in headers if h["name"] == "From"), "Unknown"
-                    ),
-                    "subject": next(
-                        (h["value"] for h in headers if h["name"] == "Subject"),
-                        "No Subject",
-                    ),
-                    "date": next(
-                        (h["value"] for h in headers if h["name"] == "Date"), "Unknown"
-                    ),
+                    "from": headers.get("From", "Unknown"),
+                    "subject": headers.get("Subject", "No Subject"),
+                    "date": headers.get("Date", "Unknown"),
                 }
-                email_list.append(email_data)
 
-            return email_list
+    def _get_metadata(self, message_ids):
+        """
+        Fetch header metadata for message_ids in one batch request.
+
+        Returns (fetched, failed): responses and exceptions keyed by id.
+        Messages deleted since they were listed (404) are left out of both.
+        """
+        fetched = {}
+        failed = {}
+
+        def on_response(request_id, response, exception):
+            if exception is None:
+                fetched[request_id] = response
+            elif getattr(getattr(exception, "resp", None), "status", None) != 404:
+                failed[request_id] = exception
+
+        batch = self.service.new_batch_http_request(callback=on_response)
+        for message_id in message_ids:
+            batch.add(
+                self.service.users()
+                .messages()
+                .get(
+                    userId="me",
+                    id=message_id,
+                    format="metadata",  # Only get headers, not full body
+                    metadataHeaders=list(_HDR_KEYS),  # must be a list, not a tuple
+                ),
+                request_id=message_id,
+            )
+        batch.execute(http=self._http())
+        return fetched, failed
 
-        except Exception as e:
-            return {"error": str(e)}
     
     def search_emails(self, query: str, max_results=20):
         """
@@ -121,14 +463,30 @@ class GmailHandler:
         - "is:unread" - only unread emails
         - "has:attachment" - emails with attachments
         - "from:john subject:project is:unread" - combine filters
+
+        Results are cached briefly per (query, max_results), so asking the
+        same question twice in a row skips the Gmail round trips.
         """
-        # This just calls list_emails with the query
-        return self.list_emails(max_results=max_results, query=query)
+        key = (" ".join(query.split()), max_results)
+        cached = self._search_cache.get(key)
+        if cached is not None:
+            return list(cached)
+
+        result = self.list_emails(max_results=max_results, query=query)
+        if isinstance(result, list):
+            self._search_cache.set(key, result)
+        return result
 
     def read_email(self, email_id):
         """
         Get the full content of a specific email.
+
+        Delivered messages never change, so results are cached by ID.
         """
+        cached = self._read_cache.get(email_id)
+        if cached is not None:
+            return cached
+
         try:
             msg = (
                 self.service.users()
@@ -138,75 +496,80 @@ class GmailHandler:
                     id=email_id,
                     format="full",  # Get full email including body
                 )
-                .execute()
+                .execute(http=self._http(), num_retries=NUM_RETRIES)
             )
 
             # Extract headers
-            headers = msg["payload"]["headers"]
-            subject = next(
-                (h["value"] for h in headers if h["name"] == "Subject"), "No Subject"
-            )
-            from_email = next(
-                (h["value"] for h in headers if h["name"] == "From"), "Unknown"
-            )
-            date = next((h["value"] for h in headers if h["name"] == "Date"), "Unknown")
+            headers = _extract_headers(msg["payload"]["headers"])
+            subject = headers.get("Subject", "No Subject")
+            from_email = headers.get("From", "Unknown")
+            date = headers.get("Date", "Unknown")
 
             # Extract body (this is the tricky part)
             body = self._get_email_body(msg["payload"])
 
-            return {
+            result = {
                 "id": email_id,
                 "subject": subject,
                 "from": from_email,
                 "date": date,
                 "body": body,
             }
+            self._read_cache.set(email_id, result)
+            return result
 
         except Exception as e:
             return {"error": str(e)}
 
+    def invalidate(self, email_id):
+        """
+        Drop a message from the read cache.
+        """
+        self._read_cache.pop(email_id)
+
     def _get_email_body(self, payload):
         """
         Helper function to extract email body from Gmail's nested structure.
+
+        Walks the MIME tree depth-first (so text/plain nested inside e.g.
+        multipart/alternative in multipart/mixed is found) and stops at the
+        first plain-text part.
         """
-        body = ""
+        stack = [payload]
+        while stack:
+            part = stack.pop()
+            if part.get("mimeType") == "text/plain" and "data" in part.get("body", {}):
+                return _decode_b64url(part["body"]["data"]).decode("utf-8", "replace")
+            stack.extend(reversed(part.get("parts", [])))
 
-        # Check if email has parts (multipart)
-        if "parts" in payload:
-            for part in payload["parts"]:
-                if part["mimeType"] == "text/plain":
-                    # Plain text found - decode it
-                    if "data" in part["body"]:
-                        body = base64.urlsafe_b64decode(part["body"]["data"]).decode(
-                            "utf-8"
-                        )
-                        break
-        else:
-            # Simple email - body is directly in payload
-            if "body" in payload and "data" in payload["body"]:
-                body = base64.urlsafe_b64decode(payload["body"]["data"]).decode("utf-8")
+        # Simple (non text/plain) email - body is directly in payload
+        if "parts" not in payload and "data" in payload.get("body", {}):
+            return _decode_b64url(payload["body"]["data"]).decode("utf-8", "replace")
 
-        return body
+        return ""
 
     def send_email(self, to, subject, body):
         """
         Send an email from your Gmail account.
         """
         try:
-            # Create the email
-            message = MIMEText(body)
-            message["to"] = to
-            message["subject"] = subject
+            # Build the plain-text message directly instead of going through
+            # MIMEText and the email generator
+            raw = _PLAIN_MESSAGE_TEMPLATE.format(
+                to=_header_value(to, address=True),
+                subject=_header_value(subject),
+                body=body,
+            ).encode("utf-8")
 
             # Encode in base64
-            raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode("utf-8")
+            raw_message = base64.urlsafe_b64encode(raw).decode("ascii")
 
             # Send it
             send_result = (
                 self.service.users()
                 .messages()
                 .send(userId="me", body={"raw": raw_message})
-                .execute()
+                .execute(http=self._http())
             )
 
             return {"status": "sent", "message_id": send_result["id"]}
@@ -229,13 +592,8 @@ class GmailHandler:
             from_header = original['from']
             
             # Parse email from "Name <email@example.com>" format
-            import re
-            email_match = re.search(r'<(.+?)>', from_header)
-            if email_match:
-                recipient = email_match.group(1)
-            else:
-                # No angle brackets, assume it's just the email
-                recipient = from_header.strip()
+            # (falls back to the raw header if it has no parsable address)
+            recipient = parseaddr(from_header)[1] or from_header.strip()
             
             # Create reply subject (add "Re:" if not already there)
             original_subject = original['subject']
@@ -263,18 +621,53 @@ class GmailHandler:
         """
         return self.send_email(to, subject, body)
 
-import imaplib
-import smtplib
 import email
 from email.header import decode_header
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from email.parser import BytesHeaderParser
+import re
+import codecs
+from email.message import EmailMessage
+from email import policy
 import os
+import sys
+import threading
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# CRLF line endings and RFC 2047 header encoding, as SMTP expects
+_SMTP_POLICY = policy.SMTP
+
+# FETCH item for the list/search views: just the headers we display
+_HEADER_FETCH = "(BODY.PEEK[HEADER.FIELDS (FROM SUBJECT DATE)])"
+
+# Picks the UID out of a FETCH response line
+_UID_RE = re.compile(rb"UID (\d+)")
+
+# Stops at the end of the header block instead of parsing a body
+_HEADER_PARSER = BytesHeaderParser()
+
+# Charset name -> codec decode function (the same few charsets repeat
+# across every mailbox, so the codec registry is only consulted once each)
+_UTF8_DECODE = codecs.lookup("utf-8").decode
+_CODEC_DECODERS = {None: _UTF8_DECODE, "utf-8": _UTF8_DECODE}
+
+
+def _codec_decoder(encoding):
+    """
+    Return the decode function for a header charset, defaulting to UTF-8.
+    """
+    decoder = _CODEC_DECODERS.get(encoding)
+    if decoder is None:
+        try:
+            decoder = codecs.lookup(encoding).decode
+        except LookupError:
+            # Unknown charset name - decode as UTF-8 instead of failing
+            decoder = _UTF8_DECODE
+        _CODEC_DECODERS[encoding] = decoder
+    return decoder
+
 
 class iCloudHandler:
     def __init__(self):
@@ -288,6 +681,114 @@ class iCloudHandler:
         self.imap_port = 993
         self.smtp_port = 587
 
+        # Connections are opened lazily and reused across calls
+        self._imap = None
+        self._smtp = None
+        self._imap_lock = threading.Lock()
+        self._smtp_lock = threading.Lock()
+
+        # Message ids are IMAP UIDs, which never change for a message, so
+        # read results can be cached safely
+        self._read_cache = TTLCache(maxsize=READ_CACHE_SIZE, ttl=READ_CACHE_TTL)
+
+    def _connect_imap(self):
+        """
+        Return the pooled IMAP connection, logging in if needed.
+
+        Must be called with _imap_lock held.
+        """
+        import imaplib
+
+        if self._imap is None:
+            mail = imaplib.IMAP4_SSL(self.imap_server, self.imap_port)
+            mail.login(self.email, self.password)
+            self._imap = mail
+        return self._imap
+
+    def _drop_imap(self):
+        """
+        Forget a broken IMAP connection so the next call reconnects.
+        """
+        mail, self._imap = self._imap, None
+        if mail is not None:
+            try:
+                mail.shutdown()
+            except Exception:
+                pass
+
+    def _with_imap(self, operation):
+        """
+        Run operation(mail) on the pooled IMAP connection.
+
+        If the server dropped the connection since it was last used,
+        reconnect and try once more (all our IMAP operations are reads).
+        """
+        import imaplib
+
+        with self._imap_lock:
+            try:
+                return operation(self._connect_imap())
+            except (imaplib.IMAP4.abort, OSError):
+                self._drop_imap()
+                return operation(self._connect_imap())
+
+    def _connect_smtp(self):
+        """
+        Return the pooled SMTP connection, reconnecting if it went stale.
+
+        Must be called with _smtp_lock held.
+        """
+        import smtplib
+
+        if self._smtp is not None:
+            try:
+                # Cheap liveness check so we never send on a dead socket
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port)
+        server.starttls()  # Enable encryption
+        server.login(self.email, self.password)
+        self._smtp = server
+        return server
+
+    def close(self):
+        """
+        Log out of the pooled IMAP and SMTP connections.
+        """
+        with self._imap_lock:
+            if self._imap is not None:
+                try:
+                    self._imap.logout()
+                except Exception:
+                    pass
+                self._imap = None
+
+        with self._smtp_lock:
+            if self._smtp is not None:
+                try:
+                    self._smtp.quit()
+                except Exception:
+                    pass
+                self._smtp = None
+
+    def prewarm(self):
+        """
+        Open and log in the pooled IMAP connection ahead of the first call.
+        """
+        self._with_imap(lambda mail: mail.noop())
+
+    def keepalive(self):
+        """
+        Send a NOOP on the pooled IMAP connection, if one is open, so the
+        server doesn't drop it for inactivity between tool calls.
+        """
+        if self._imap is not None:
+            self._with_imap(lambda mail: mail.noop())
+
     def list_emails(self, max_results=10, mailbox='INBOX'):
         """
         Fetch emails from iCloud using IMAP.
@@ -300,63 +801,97 @@ class iCloudHandler:
             List of email metadata
         """
         try:
-            # Connect to IMAP server
-            mail = imaplib.IMAP4_SSL(self.imap_server, self.imap_port)
-            mail.login(self.email, self.password)
+            return list(self.iter_emails(max_results=max_results, mailbox=mailbox))
             
-            # Select mailbox
+        except Exception as e:
+            return {'error': str(e)}
+
+    def iter_emails(self, max_results=10, mailbox='INBOX'):
+        """
+        Yield email metadata from iCloud, newest first.
+
+        Errors are raised rather than returned as {'error': ...}.
+        """
+        return self._iter_search('ALL', max_results, mailbox)
+
+    def _iter_search(self, criteria, max_results, mailbox='INBOX'):
+        """
+        Yield metadata for the newest messages matching an IMAP search.
+
+        All headers are fetched in one round trip, and the connection is
+        released before parsing starts, so slow consumers don't hold it.
+        """
+        def search(mail):
             mail.select(mailbox)
-            
-            # Search for all emails
-            status, messages = mail.search(None, 'ALL')
-            
-            # Get list of email IDs
-            email_ids = messages[0].split()
-            
+
+            # UIDs rather than sequence numbers, so ids stay valid even if
+            # other messages are deleted between listing and reading
+            status, messages = mail.uid('SEARCH', None, criteria)
+            if status != 'OK':
+                raise RuntimeError('Search failed')
+
             # Get the most recent emails (IMAP returns oldest first, so reverse)
-            email_ids = email_ids[-max_results:][::-1]
-            
-            email_list = []
-            
-            for email_id in email_ids:
-                # Fetch email headers only (faster than fetching full body)
-                status, msg_data = mail.fetch(email_id, '(RFC822.HEADER)')
-                
-                # Parse the email
-                msg = email.message_from_bytes(msg_data[0][1])
-                
-                # Decode subject (might be encoded)
-                subject = self._decode_header(msg.get('Subject', 'No Subject'))
-                from_email = msg.get('From', 'Unknown')
-                date = msg.get('Date', 'Unknown')
-                
-                # CRITICAL FIX: email_id from IMAP is bytes, convert to string
-                # DO NOT call .decode() directly - check type first!
-                if isinstance(email_id, bytes):
-                    email_id_str = email_id.decode()
-                elif isinstance(email_id, int):
-                    email_id_str = str(email_id)
+            email_ids = messages[0].split()[-max_results:][::-1]
+
+            return email_ids, self._fetch_headers(mail, email_ids)
+
+        email_ids, headers_by_id = self._with_imap(search)
+
+        for email_id in email_ids:
+            raw_headers = headers_by_id.get(email_id)
+            if raw_headers is None:
+                continue
+
+            msg = _HEADER_PARSER.parsebytes(raw_headers)
+
+            # Decode subject (might be encoded)
+            subject = self._decode_header(msg.get('Subject', 'No Subject'))
+            from_email = msg.get('From', 'Unknown')
+            date = msg.get('Date', 'Unknown')
+
+            yield {
+                'id': email_id.decode(),  # IMAP ids are bytes, return a string
+                'subject': subject,
+                'from': from_email,
+                'date': date,
+                'snippet': f"iCloud email from {from_email}"
+            }
+
+    def _fetch_headers(self, mail, email_ids):
+        """
+        Fetch headers for several messages with a single IMAP FETCH.
+
+        Args:
+            mail: Logged-in IMAP connection with a mailbox selected
+            email_ids: Message UIDs (bytes)
+
+        Returns:
+            Dict mapping each message UID to its raw header bytes
+        """
+        if not email_ids:
+            return {}
+
+        # One FETCH for the whole sequence set instead of one per message.
+        # Only the headers we show are transferred (not the Received:/DKIM
+        # bulk), and PEEK leaves the \Seen flag alone.
+        status, msg_data = mail.uid('FETCH', b",".join(email_ids), _HEADER_FETCH)
+
+        # Responses come back as (b'<seq> (UID <uid> BODY[HEADER.FIELDS ...] {n}',
+        # b'<headers>') tuples separated by b')' - not necessarily in request
+        # order. A server may also send the UID after the literal, in the
+        # b' UID <uid>)' element that follows the tuple
+        headers_by_id = {}
+        for i, part in enumerate(msg_data):
+            if isinstance(part, tuple):
+                match = _UID_RE.search(part[0])
+                if not match and i + 1 < len(msg_data) and isinstance(msg_data[i + 1], bytes):
+                    match = _UID_RE.search(msg_data[i + 1])
+                if match:
+                    headers_by_id[match.group(1)] = part[1]
                 else:
-                    email_id_str = str(email_id)  # Fallback
-                
-                email_list.append({
-                    'id': email_id_str,  # ← Now always a string, no .decode()
-                    'subject': subject,
-                    'from': from_email,
-                    'date': date,
-                    'snippet': f"iCloud email from {from_email}"
-                })
-            
-            mail.close()
-            mail.logout()
-            
-            return email_list
-            
-        except Exception as e:
-            return {'error': str(e)}
+                    print(f"⚠️ iCloud FETCH response without a UID: {part[0]!r}", file=sys.stderr)
 
-        except Exception as e:
-            return {"error": str(e)}
+        return headers_by_id
 
     def _decode_header(self, header):
         """
@@ -365,26 +900,23 @@ class iCloudHandler:
         if header is None:
             return ""
 
-        decoded_parts = decode_header(header)
-        decoded_header = ""
-
-        for part, encoding in decoded_parts:
-            if isinstance(part, bytes):
-                decoded_header += part.decode(encoding or "utf-8")
-            else:
-                decoded_header += part
-
-        return decoded_header
+        return "".join(
+            _codec_decoder(encoding)(part, "replace")[0] if isinstance(part, bytes) else part
+            for part, encoding in decode_header(header)
+        )
 
     def read_email(self, email_id):
         """
         Get full email content from iCloud.
+
+        email_id is an IMAP UID (as returned by list/search), so results
+        are cached by ID.
         """
-        try:
-            mail = imaplib.IMAP4_SSL(self.imap_server, self.imap_port)
-            mail.login(self.email, self.password)
-            mail.select("INBOX")
+        cached = self._read_cache.get(str(email_id))
+        if cached is not None:
+            return cached
 
+        try:
             # FIX: Ensure email_id is bytes for IMAP
             # Handle both string and int inputs
             if isinstance(email_id, str):
@@ -394,8 +926,15 @@ class iCloudHandler:
             else:
                 email_id_bytes = email_id  # Already bytes
 
+            def fetch(mail):
+                mail.select("INBOX")
+                # BODY.PEEK[] is the full message without marking it read
+                return mail.uid("FETCH", email_id_bytes, "(BODY.PEEK[])")
+
             # Fetch the full email
-            status, msg_data = mail.fetch(email_id_bytes, "(RFC822)")
+            status, msg_data = self._with_imap(fetch)
+            if not msg_data or not isinstance(msg_data[0], tuple):
+                return {"error": f"Email {email_id} not found"}
 
             # Parse email
             msg = email.message_from_bytes(msg_data[0][1])
@@ -407,16 +946,15 @@ class iCloudHandler:
             # Extract body
             body = self._get_email_body(msg)
 
-            mail.close()
-            mail.logout()
-
-            return {
+            result = {
                 "id": str(email_id),    # Return as Stringg
                 "subject": subject,
                 "from": from_email,
                 "date": date,
                 "body": body,
             }
+            self._read_cache.set(str(email_id), result)
+            return result
 
         except Exception as e:
             return {"error": str(e)}
@@ -428,14 +966,18 @@ class iCloudHandler:
         body = ""
 
         if msg.is_multipart():
-            for part in msg.walk():
-                content_type = part.get_content_type()
-                if content_type == "text/plain":
-                    try:
-                        body = part.get_payload(decode=True).decode()
-                        break
-                    except:
-                        pass
+            # First text/plain part anywhere in the tree
+            part = next(
+                (p for p in msg.walk() if p.get_content_type() == "text/plain"),
+                None
+            )
+            if part is not None:
+                payload = part.get_payload(decode=True) or b""
+                try:
+                    body = payload.decode(part.get_content_charset() or "utf-8", "replace")
+                except LookupError:
+                    # Unknown charset name
+                    body = payload.decode("utf-8", "replace")
         else:
             # Simple email
             try:
@@ -450,21 +992,18 @@ class iCloudHandler:
         Send email via iCloud SMTP.
         """
         try:
-            # Create email message
-            msg = MIMEMultipart()
+            # Create a single-part plain-text message (no multipart tree)
+            msg = EmailMessage(policy=_SMTP_POLICY)
             msg["From"] = self.email
             msg["To"] = to
             msg["Subject"] = subject
-            msg.attach(MIMEText(body, "plain"))
-
-            # Connect to SMTP server
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()  # Enable encryption
-            server.login(self.email, self.password)
+            # Non-ASCII bodies go out quoted-printable rather than raw 8bit,
+            # which SMTP only allows when the server advertises 8BITMIME
+            msg.set_content(body, cte=None if body.isascii() else "quoted-printable")
 
-            # Send email
-            server.send_message(msg)
-            server.quit()
+            # Send over the pooled SMTP connection
+            with self._smtp_lock:
+                self._connect_smtp().send_message(msg)
 
             return {"status": "sent", "to": to}
 
@@ -479,60 +1018,7 @@ class iCloudHandler:
         This searches for emails where the 'From' field contains the sender string.
         """
         try:
-            mail = imaplib.IMAP4_SSL(self.imap_server, self.imap_port)
-            mail.login(self.email, self.password)
-            mail.select('INBOX')
-            
-            search_criteria = f'(FROM "{sender}")'
-            status, messages = mail.search(None, search_criteria)
-            
-            if status != 'OK':
-                mail.close()
-                mail.logout()
-                return {'error': 'Search failed'}
-            
-            # Get email IDs
-            email_ids = messages[0].split()
-            
-            if not email_ids:
-                mail.close()
-                mail.logout()
-                return []
-            
-            # Get most recent matches
-            email_ids = email_ids[-max_results:][::-1]
-            
-            email_list = []
-            
-            for email_id in email_ids:
-                status, msg_data = mail.fetch(email_id, '(RFC822.HEADER)')
-                
-                msg = email.message_from_bytes(msg_data[0][1])
-                
-                subject = self._decode_header(msg.get('Subject', 'No Subject'))
-                from_email = msg.get('From', 'Unknown')
-                date = msg.get('Date', 'Unknown')
-                
-                # Convert email_id properly
-                if isinstance(email_id, bytes):
-                    email_id_str = email_id.decode()
-                elif isinstance(email_id, int):
-                    email_id_str = str(email_id)
-                else:
-                    email_id_str = str(email_id)
-                
-                email_list.append({
-                    'id': email_id_str,
-                    'subject': subject,
-                    'from': from_email,
-                    'date': date,
-                    'snippet': f"iCloud email from {from_email}"
-                })
-            
-            mail.close()
-            mail.logout()
-            
-            return email_list
+            return list(self._iter_search(f'(FROM "{sender}")', max_results))
             
         except Exception as e:
             return {'error': str(e)}
@@ -551,12 +1037,7 @@ class iCloudHandler:
             # Extract sender email
             from_header = original['from']
             
-            import re
-            email_match = re.search(r'<(.+?)>', from_header)
-            if email_match:
-                recipient = email_match.group(1)
-            else:
-                recipient = from_header.strip()
+            recipient = parseaddr(from_header)[1] or from_header.strip()
             
             # Create reply subject
             original_subject = original['subject']
@@ -584,4 +1065,20 @@ class iCloudHandler:
         
         Wrapper around send_email for clarity.
         """
-        return self.send_email(to, subject, body)
\ No newline at end of file
+        return self.send_email(to, subject, body)
+
+
+@lru_cache(maxsize=1)
+def get_gmail_handler():
+    """
+    Return the process-wide GmailHandler, creating it on first use.
+    """
+    return GmailHandler(credentials_path="credentials.json")
+
+
+@lru_cache(maxsize=1)
+def get_icloud_handler():
+    """
+    Return the process-wide iCloudHandler, creating it on first use.
+    """
+    return iCloudHandler()
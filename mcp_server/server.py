@@ -2,6 +2,7 @@
 MCP Server for Email Operations
 """
 import asyncio
+import inspect
 import sys
 from pathlib import Path
 
@@ -11,12 +12,28 @@ sys.path.insert(0, str(Path(__file__).parent))
 from mcp.server import Server
 from mcp.types import Tool, TextContent
 from mcp.server.stdio import stdio_server
-import json
-from email_tools import GmailHandler, iCloudHandler
+from email_tools import get_gmail_handler, get_icloud_handler
 
-# Initialize email handlers
-gmail_handler = GmailHandler(credentials_path='credentials.json')
-icloud_handler = iCloudHandler()
+__all__ = ["app", "main"]
+
+# uvloop is a faster drop-in event loop (not available on Windows)
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# orjson serialises large email listings much faster; fall back to stdlib json.
+# Results are read by the client, not people, so they're sent compact.
+try:
+    import orjson
+
+    def dumps(obj):
+        return orjson.dumps(obj).decode()
+except ImportError:
+    import json
+
+    def dumps(obj):
+        return json.dumps(obj, separators=(",", ":"))
 
 # Create MCP server
 app = Server("email-agent-server")
@@ -25,289 +42,416 @@ app = Server("email-agent-server")
 # TOOL DEFINITIONS
 # ============================================
 
-@app.list_tools()
-async def list_tools() -> list[Tool]:
-    """
-    Define available tools for MCP clients.
-    
-    The AI will read these descriptions to decide which tool to call.
-    """
-    return [
-        Tool(
-            name="list_gmail_emails",
-            description="Fetch recent emails from Gmail. Can filter by search query (e.g., 'is:unread', 'from:someone@example.com')",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "max_results": {
-                        "type": "number",
-                        "description": "Number of emails to fetch (default: 10)",
-                        "default": 10
-                    },
-                    "query": {
-                        "type": "string", 
-                        "description": "Gmail search query (optional)",
-                        "default": ""
-                    }
+# Static tool definitions, built once at import instead of on every
+# tools/list request. The AI will read these descriptions to decide which
+# tool to call.
+_TOOLS = [
+    Tool(
+        name="list_gmail_emails",
+        description="Fetch recent emails from Gmail. Can filter by search query (e.g., 'is:unread', 'from:someone@example.com')",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "max_results": {
+                    "type": "number",
+                    "description": "Number of emails to fetch (default: 10)",
+                    "default": 10
+                },
+                "query": {
+                    "type": "string", 
+                    "description": "Gmail search query (optional)",
+                    "default": ""
                 }
             }
-        ),
-        Tool(
-            name="list_icloud_emails",
-            description="Fetch recent emails from iCloud/Apple Mail",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "max_results": {
-                        "type": "number",
-                        "description": "Number of emails to fetch (default: 10)",
-                        "default": 10
-                    }
+        }
+    ),
+    Tool(
+        name="list_all_emails",
+        description="Fetch recent emails from both Gmail and iCloud at once. Returns {\"gmail\": [...], \"icloud\": [...]}",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "max_results": {
+                    "type": "number",
+                    "description": "Number of emails to fetch from each account (default: 10)",
+                    "default": 10
                 }
             }
-        ),
-        Tool(
-            name="read_gmail_email",
-            description="Read the full content of a specific Gmail email by ID",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "email_id": {
-                        "type": "string",
-                        "description": "The Gmail message ID"
-                    }
-                },
-                "required": ["email_id"]
+        }
+    ),
+    Tool(
+        name="list_icloud_emails",
+        description="Fetch recent emails from iCloud/Apple Mail",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "max_results": {
+                    "type": "number",
+                    "description": "Number of emails to fetch (default: 10)",
+                    "default": 10
+                }
             }
-        ),
-        Tool(
-            name="read_icloud_email",
-            description="Read the full content of a specific iCloud email by ID",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "email_id": {
-                        "type": "string",
-                        "description": "The iCloud message ID"
-                    }
+        }
+    ),
+    Tool(
+        name="read_gmail_email",
+        description="Read the full content of a specific Gmail email by ID",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "email_id": {
+                    "type": "string",
+                    "description": "The Gmail message ID"
+                }
+            },
+            "required": ["email_id"]
+        }
+    ),
+    Tool(
+        name="read_icloud_email",
+        description="Read the full content of a specific iCloud email by ID",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "email_id": {
+                    "type": "string",
+                    "description": "The iCloud message ID"
+                }
+            },
+            "required": ["email_id"]
+        }
+    ),
+    Tool(
+        name="send_gmail_email",
+        description="Send an email via Gmail",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "to": {
+                    "type": "string",
+                    "description": "Recipient email address"
                 },
-                "required": ["email_id"]
-            }
-        ),
-        Tool(
-            name="send_gmail_email",
-            description="Send an email via Gmail",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "to": {
-                        "type": "string",
-                        "description": "Recipient email address"
-                    },
-                    "subject": {
-                        "type": "string",
-                        "description": "Email subject"
-                    },
-                    "body": {
-                        "type": "string",
-                        "description": "Email body (plain text)"
-                    }
+                "subject": {
+                    "type": "string",
+                    "description": "Email subject"
                 },
-                "required": ["to", "subject", "body"]
-            }
-        ),
-        Tool(
-            name="send_icloud_email",
-            description="Send an email via iCloud",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "to": {
-                        "type": "string",
-                        "description": "Recipient email address"
-                    },
-                    "subject": {
-                        "type": "string",
-                        "description": "Email subject"
-                    },
-                    "body": {
-                        "type": "string",
-                        "description": "Email body (plain text)"
-                    }
+                "body": {
+                    "type": "string",
+                    "description": "Email body (plain text)"
+                }
+            },
+            "required": ["to", "subject", "body"]
+        }
+    ),
+    Tool(
+        name="send_icloud_email",
+        description="Send an email via iCloud",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "to": {
+                    "type": "string",
+                    "description": "Recipient email address"
                 },
-                "required": ["to", "subject", "body"]
-            }
-        ),
-         Tool(
-            name="search_gmail",
-            description="Search Gmail emails with advanced filters. Supports: from:email, subject:text, after:YYYY/MM/DD, before:YYYY/MM/DD, is:unread, has:attachment. Combine multiple filters with spaces.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "query": {
-                        "type": "string",
-                        "description": "Gmail search query (e.g., 'from:john@example.com subject:meeting', 'is:unread after:2024/01/01')"
-                    },
-                    "max_results": {
-                        "type": "number",
-                        "description": "Maximum number of results (default: 20)",
-                        "default": 20
-                    }
+                "subject": {
+                    "type": "string",
+                    "description": "Email subject"
                 },
-                "required": ["query"]
-            }
-        ),
-        
-        Tool(
-            name="search_icloud",
-            description="Search iCloud emails. Note: iCloud IMAP has limited search - best for 'from:' searches. For complex queries, use Gmail.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "sender": {
-                        "type": "string",
-                        "description": "Email address or name to search for in 'From' field"
-                    },
-                    "max_results": {
-                        "type": "number",
-                        "description": "Maximum number of results (default: 20)",
-                        "default": 20
-                    }
+                "body": {
+                    "type": "string",
+                    "description": "Email body (plain text)"
+                }
+            },
+            "required": ["to", "subject", "body"]
+        }
+    ),
+     Tool(
+        name="search_gmail",
+        description="Search Gmail emails with advanced filters. Supports: from:email, subject:text, after:YYYY/MM/DD, before:YYYY/MM/DD, is:unread, has:attachment. Combine multiple filters with spaces.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "Gmail search query (e.g., 'from:john@example.com subject:meeting', 'is:unread after:2024/01/01')"
                 },
-                "required": ["sender"]
-            }
-        ),
-
-        Tool(
-            name="draft_gmail_reply",
-            description="Draft a reply to a specific Gmail email. Returns the draft content for user approval before sending.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "email_id": {
-                        "type": "string",
-                        "description": "The Gmail message ID to reply to"
-                    },
-                    "reply_body": {
-                        "type": "string",
-                        "description": "The body text of the reply email"
-                    }
+                "max_results": {
+                    "type": "number",
+                    "description": "Maximum number of results (default: 20)",
+                    "default": 20
+                }
+            },
+            "required": ["query"]
+        }
+    ),
+    
+    Tool(
+        name="search_icloud",
+        description="Search iCloud emails. Note: iCloud IMAP has limited search - best for 'from:' searches. For complex queries, use Gmail.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "sender": {
+                    "type": "string",
+                    "description": "Email address or name to search for in 'From' field"
                 },
-                "required": ["email_id", "reply_body"]
-            }
-        ),
-        
-        Tool(
-            name="draft_icloud_reply",
-            description="Draft a reply to a specific iCloud email. Returns the draft content for user approval before sending.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "email_id": {
-                        "type": "string",
-                        "description": "The iCloud message ID to reply to"
-                    },
-                    "reply_body": {
-                        "type": "string",
-                        "description": "The body text of the reply email"
-                    }
+                "max_results": {
+                    "type": "number",
+                    "description": "Maximum number of results (default: 20)",
+                    "default": 20
+                }
+            },
+            "required": ["sender"]
+        }
+    ),
+
+    Tool(
+        name="draft_gmail_reply",
+        description="Draft a reply to a specific Gmail email. Returns the draft content for user approval before sending.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "email_id": {
+                    "type": "string",
+                    "description": "The Gmail message ID to reply to"
                 },
-                "required": ["email_id", "reply_body"]
-            }
-        )
-    ]
+                "reply_body": {
+                    "type": "string",
+                    "description": "The body text of the reply email"
+                }
+            },
+            "required": ["email_id", "reply_body"]
+        }
+    ),
+    
+    Tool(
+        name="draft_icloud_reply",
+        description="Draft a reply to a specific iCloud email. Returns the draft content for user approval before sending.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "email_id": {
+                    "type": "string",
+                    "description": "The iCloud message ID to reply to"
+                },
+                "reply_body": {
+                    "type": "string",
+                    "description": "The body text of the reply email"
+                }
+            },
+            "required": ["email_id", "reply_body"]
+        }
+    )
+]
+
+# Required argument names per tool, read from the schemas once
+_REQUIRED = {
+    tool.name: tuple(tool.inputSchema.get("required", ()))
+    for tool in _TOOLS
+}
+
+
+@app.list_tools()
+async def list_tools() -> list[Tool]:
+    """
+    Define available tools for MCP clients.
+    """
+    return _TOOLS
 
 # ============================================
 # TOOL EXECUTION
 # ============================================
 
+# Cap concurrent calls per account, so a burst of tool calls overlaps its
+# network waits without tripping Gmail rate limits or iCloud's connection cap
+_GMAIL_SEM = asyncio.Semaphore(8)
+_ICLOUD_SEM = asyncio.Semaphore(4)
+
+
+async def run_limited(sem, func, *args, **kwargs):
+    """
+    Run a blocking handler call in a worker thread once `sem` allows it.
+    """
+    async with sem:
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+
+async def list_all_emails(arguments):
+    """
+    List Gmail and iCloud concurrently, so the total wait is the slower
+    account rather than both added together.
+    """
+    max_results = arguments.get("max_results", 10)
+    results = await asyncio.gather(
+        run_limited(_GMAIL_SEM, get_gmail_handler().list_emails, max_results=max_results),
+        run_limited(_ICLOUD_SEM, get_icloud_handler().list_emails, max_results=max_results),
+        return_exceptions=True
+    )
+
+    # One account failing shouldn't hide the other's emails
+    gmail, icloud = (
+        {"error": str(r)} if isinstance(r, Exception) else r for r in results
+    )
+    return {"gmail": gmail, "icloud": icloud}
+
+
+# Tool name -> function(arguments) running the blocking handler call.
+# Coroutine functions (which fan out themselves) are awaited directly.
+_DISPATCH = {
+    "list_all_emails": list_all_emails,
+    "list_gmail_emails": lambda a: get_gmail_handler().list_emails(
+        max_results=a.get("max_results", 10), query=a.get("query", "")
+    ),
+    "list_icloud_emails": lambda a: get_icloud_handler().list_emails(
+        max_results=a.get("max_results", 10)
+    ),
+    "read_gmail_email": lambda a: get_gmail_handler().read_email(a["email_id"]),
+    "read_icloud_email": lambda a: get_icloud_handler().read_email(a["email_id"]),
+    "send_gmail_email": lambda a: get_gmail_handler().send_email(a["to"], a["subject"], a["body"]),
+    "send_icloud_email": lambda a: get_icloud_handler().send_email(a["to"], a["subject"], a["body"]),
+    "search_gmail": lambda a: get_gmail_handler().search_emails(
+        query=a["query"], max_results=a.get("max_results", 20)
+    ),
+    "search_icloud": lambda a: get_icloud_handler().search_emails_by_sender(
+        sender=a["sender"], max_results=a.get("max_results", 20)
+    ),
+    "draft_gmail_reply": lambda a: get_gmail_handler().draft_reply(a["email_id"], a["reply_body"]),
+    "draft_icloud_reply": lambda a: get_icloud_handler().draft_reply(a["email_id"], a["reply_body"]),
+}
+
+# Which account's limit each blocking tool counts against
+_TOOL_SEMS = {
+    name: _ICLOUD_SEM if "icloud" in name else _GMAIL_SEM
+    for name, handler in _DISPATCH.items()
+    if not inspect.iscoroutinefunction(handler)
+}
+
+
 @app.call_tool()
-async def call_tool(name: str, arguments: dict) -> list[TextContent]:
+async def call_tool(name: str, arguments: dict) -> tuple[TextContent]:
     """
     Execute a tool when the MCP client calls it.
     
-    Routes tool calls to the appropriate email handler.
+    Routes tool calls to the appropriate email handler. The handlers use
+    blocking Gmail/IMAP/SMTP clients, so they run in worker threads to keep
+    the event loop (and the stdio transport) responsive.
     """
     try:
         # Route to appropriate handler
-        if name == "list_gmail_emails":
-            max_results = arguments.get("max_results", 10)
-            query = arguments.get("query", "")
-            result = gmail_handler.list_emails(max_results=max_results, query=query)
-            
-        elif name == "list_icloud_emails":
-            max_results = arguments.get("max_results", 10)
-            result = icloud_handler.list_emails(max_results=max_results)
-            
-        elif name == "read_gmail_email":
-            email_id = arguments["email_id"]
-            result = gmail_handler.read_email(email_id)
-            
-        elif name == "read_icloud_email":
-            email_id = arguments["email_id"]
-            result = icloud_handler.read_email(email_id)
-            
-        elif name == "send_gmail_email":
-            to = arguments["to"]
-            subject = arguments["subject"]
-            body = arguments["body"]
-            result = gmail_handler.send_email(to, subject, body)
-            
-        elif name == "send_icloud_email":
-            to = arguments["to"]
-            subject = arguments["subject"]
-            body = arguments["body"]
-            result = icloud_handler.send_email(to, subject, body)
-        
-        elif name == "search_gmail":
-            query = arguments["query"]
-            max_results = arguments.get("max_results", 20)
-            result = gmail_handler.search_emails(query=query, max_results=max_results)
-            
-        elif name == "search_icloud":
-            sender = arguments["sender"]
-            max_results = arguments.get("max_results", 20)
-            result = icloud_handler.search_emails_by_sender(sender=sender, max_results=max_results)
-        
-        elif name == "draft_gmail_reply":
-            email_id = arguments["email_id"]
-            reply_body = arguments["reply_body"]
-            result = gmail_handler.draft_reply(email_id, reply_body)
-            
-        elif name == "draft_icloud_reply":
-            email_id = arguments["email_id"]
-            reply_body = arguments["reply_body"]
-            result = icloud_handler.draft_reply(email_id, reply_body)
-            
-        else:
+        handler = _DISPATCH.get(name)
+        missing = [key for key in _REQUIRED.get(name, ()) if key not in arguments]
+        if handler is None:
             result = {"error": f"Unknown tool: {name}"}
+        elif missing:
+            # Reject bad calls before paying for a thread hop and a round trip
+            result = {"error": f"Missing required argument(s): {', '.join(missing)}"}
+        elif inspect.iscoroutinefunction(handler):
+            result = await handler(arguments)
+        else:
+            result = await run_limited(_TOOL_SEMS[name], handler, arguments)
         
         # Return result as JSON
-        return [TextContent(
-            type="text",
-            text=json.dumps(result, indent=2)
-        )]
+        return _text_result(result)
         
     except Exception as e:
-        return [TextContent(
-            type="text",
-            text=json.dumps({"error": str(e)}, indent=2)
-        )]
+        return _text_result({"error": str(e)})
+
+
+def _text_result(result):
+    """
+    Wrap a JSON-serialisable result as the single TextContent item MCP
+    expects. A 1-tuple is cheaper to build than a list and the SDK only
+    iterates over it.
+    """
+    return (TextContent(type="text", text=dumps(result)),)
 
 # ============================================
 # SERVER STARTUP
 # ============================================
 
+async def prewarm():
+    """
+    Open the Gmail and iCloud connections in the background so the first
+    tool call doesn't pay for the TLS handshake and login.
+
+    Skips and failures are reported on stderr (stdout carries the MCP
+    protocol); the real tool call will try again.
+    """
+    gmail, icloud = await asyncio.gather(
+        asyncio.to_thread(get_gmail_handler().prewarm),
+        asyncio.to_thread(get_icloud_handler().prewarm),
+        return_exceptions=True
+    )
+    if gmail is False:
+        print("ℹ️ Gmail pre-warm skipped: no usable saved token yet", file=sys.stderr)
+    for name, result in (("Gmail", gmail), ("iCloud", icloud)):
+        if isinstance(result, Exception):
+            print(f"⚠️ {name} pre-warm failed: {result}", file=sys.stderr)
+
+
+# How often to check whether the Gmail token is close to expiring
+CREDS_CHECK_INTERVAL = 60
+
+
+async def refresh_gmail_credentials():
+    """
+    Keep the Gmail access token fresh in the background, so no tool call
+    pays for a token refresh round trip.
+
+    Failures are reported on stderr (stdout carries the MCP protocol); the
+    next check (or the request itself) will try again.
+    """
+    while True:
+        try:
+            await asyncio.to_thread(get_gmail_handler().refresh_credentials)
+        except Exception as e:
+            print(f"⚠️ Gmail token refresh failed: {e}", file=sys.stderr)
+        await asyncio.sleep(CREDS_CHECK_INTERVAL)
+
+
+# iCloud drops idle IMAP connections after ~10 minutes
+IMAP_KEEPALIVE_INTERVAL = 540
+
+
+async def keep_icloud_alive():
+    """
+    Periodically NOOP the pooled iCloud IMAP connection so tool calls after
+    a quiet spell don't have to reconnect and log in again.
+    """
+    while True:
+        await asyncio.sleep(IMAP_KEEPALIVE_INTERVAL)
+        try:
+            await run_limited(_ICLOUD_SEM, get_icloud_handler().keepalive)
+        except Exception:
+            pass
+
+
 async def main():
     """
     Start the MCP server using stdio for communication.
     """
-    async with stdio_server() as (read_stream, write_stream):
-        await app.run(
-            read_stream,
-            write_stream,
-            app.create_initialization_options()
-        )
+    # Start accepting requests right away while connections warm up
+    prewarm_task = asyncio.create_task(prewarm())
+    refresh_task = asyncio.create_task(refresh_gmail_credentials())
+    keepalive_task = asyncio.create_task(keep_icloud_alive())
+
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await app.run(
+                read_stream,
+                write_stream,
+                app.create_initialization_options()
+            )
+    finally:
+        prewarm_task.cancel()
+        refresh_task.cancel()
+        keepalive_task.cancel()
+
+        # Log out of the pooled iCloud connections (blocking IMAP/SMTP I/O)
+        await asyncio.to_thread(get_icloud_handler().close)
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    if uvloop:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
\ No newline at end of file
@@ -12,13 +12,24 @@ This bot:
 """
 
 import os
+import io
+import asyncio
 import logging
 import tempfile
 import sys
 import re
-import json
 import html
+import hashlib
 import random
+import sqlite3
+import threading
+import time
+import zlib
+from types import MappingProxyType
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from email.utils import parseaddr
 from pathlib import Path
 from telegram import Update
 from telegram.ext import (
@@ -29,18 +40,311 @@ from telegram.ext import (
     ContextTypes,
 )
 from dotenv import load_dotenv
-from groq import Groq
+from groq import AsyncGroq
 
-sys.path.insert(0, str(Path(__file__).parent.parent))
-from agent.mcp_client import MCPEmailClient
+# orjson parses the LLM's JSON decisions faster; fall back to stdlib json
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
 
-load_dotenv()
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+try:
+    from agent.mcp_client import MCPEmailClient
+except ImportError:
+    # Run as a script (python telegram_bot/bot.py): the project root isn't
+    # on the path yet
+    sys.path.insert(0, str(_PROJECT_ROOT))
+    from agent.mcp_client import MCPEmailClient
+
+# Settings below are read from the environment at import time, so this has
+# to run here; the explicit path skips find_dotenv's directory walk
+load_dotenv(_PROJECT_ROOT / ".env")
 
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
 )
 logger = logging.getLogger(__name__)
 
+# Spoken numbers -> digits, including common Whisper mishearings
+_NUMBER_WORDS = MappingProxyType({
+    'one': '1', 'two': '2', 'three': '3', 'four': '4', 'five': '5',
+    'six': '6', 'seven': '7', 'eight': '8', 'nine': '9', 'ten': '10',
+    'first': '1', 'second': '2', 'third': '3', 'fourth': '4', 'fifth': '5',
+    'sixth': '6', 'seventh': '7', 'eighth': '8', 'ninth': '9', 'tenth': '10',
+    'to': '2', 'too': '2', 'tu': '2', 'for': '4', 'ate': '8',
+})
+_NUMBER_WORD_RE = re.compile(r'\b(' + '|'.join(_NUMBER_WORDS) + r')\b')
+
+_WORD_TO_NUM = MappingProxyType({
+    'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5,
+    'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10,
+    'first': 1, 'second': 2, 'third': 3, 'fourth': 4, 'fifth': 5,
+    'sixth': 6, 'seventh': 7, 'eighth': 8, 'ninth': 9, 'tenth': 10
+})
+
+# Phrase tables for process_email_command, built once
+_CAPABILITY_TRIGGERS = (
+    'what can you do', 'your skills', 'your capabilities',
+    'what are you able to do', 'help me', 'what do you do',
+    'show me features', 'what features', 'how can you help'
+)
+_SECURITY_TRIGGERS = (
+    'secure', 'safe', 'privacy', 'private', 'data security',
+    'is this safe', 'can i trust', 'security', 'protected'
+)
+# "read" in any of these is a reply/send command, not a read
+_NON_READ_WORDS = ('draft', 'reply', 'respond', 'send')
+# Commands that (re)list emails - the only ones worth a speculative listing
+_LIST_WORDS = ('check', 'show', 'list', 'inbox', 'unread', 'new mail', 'new email')
+_SINGLE_READ_TRIGGERS = (
+    'read it', 'read this', 'open it', 'open this',
+    'read the email', 'read that', 'read the mail'
+)
+_EMAIL_KEYWORDS = (
+    'email', 'mail', 'gmail', 'icloud', 'inbox', 'message',
+    'draft', 'reply', 'send', 'read', 'check', 'find', 'search',
+    'list', 'show', 'open', 'fetch', 'get', 'unread'
+)
+_OFF_TOPIC_REPLIES = (
+    "I'm an email assistant, so I focus on managing your inbox! I can check Gmail and iCloud, read emails, draft replies, and search messages. Try saying 'check my Gmail' to get started!",
+    "That's outside my expertise! I'm here to help with emails - checking Gmail and iCloud, reading messages, drafting replies, and searching your inbox. Want me to check your emails?",
+    "I'm not sure about that, but I'm great with emails! I can help you check your Gmail or iCloud, read messages, draft professional replies, and find specific emails. Try saying 'check my Gmail'!",
+    "I specialize in email management! I can check your Gmail and iCloud accounts, read emails, draft AI-powered replies, and search for specific messages. Need help with your inbox?"
+)
+
+# /start and /help texts
+_START_MESSAGE = (
+    "🤖 AI Email Agent - V4 Final\n\n"
+    "HOW TO USE:\n"
+    "1. Say or type 'check my Gmail' or 'check my iCloud'\n"
+    "2. Say or type 'read email number 1'\n"
+    "3. Say or type 'draft a reply'\n"
+    "4. Say or type 'send reply'\n\n"
+    "✨ I understand natural language!\n\n"
+    "COMMANDS:\n"
+    "/help - All voice commands\n"
+    "/status - See what I remember\n"
+    "/clear - Clear my memory\n\n"
+    "💡 Ask me: 'What can you do?' or 'Is this secure?'"
+)
+
+_HELP_MESSAGE = (
+    "📖 COMMANDS (voice or text):\n\n"
+    "LISTING:\n"
+    "• 'Check my Gmail'\n"
+    "• 'Check my iCloud'\n\n"
+    "READING:\n"
+    "• 'Read email number 1'\n"
+    "• 'Read it' (when only 1 result)\n\n"
+    "DRAFTING:\n"
+    "• 'Draft a reply'\n"
+    "• 'Draft a reply saying thanks'\n\n"
+    "SENDING:\n"
+    "• 'Send reply'\n"
+    "• 'Cancel'\n\n"
+    "SEARCHING:\n"
+    "• 'Find emails from John'\n\n"
+    "QUESTIONS:\n"
+    "• 'What can you do?'\n"
+    "• 'Is this secure?'\n\n"
+    "💡 I focus on emails - if you ask about something else, I'll gently redirect you back to email tasks!"
+)
+
+# Patterns used on every command, compiled once
+# Words, tags, a stray '<', or whitespace runs - one token at a time.
+# A whole <script>/<style> element counts as one tag, so its code is dropped
+_HTML_TOKEN_RE = re.compile(
+    r'(?is:<(script|style)\b[^>]*>.*?</\1\s*>)|[^<\s]+|<[^>]+>|<|\s+'
+)
+_WS_RE = re.compile(r'\s+')
+_DIGIT_RE = re.compile(r'\b(\d+)\b')
+# Email numbers: group 1 is digits, group 2 a number word. Reads take any
+# standalone number; drafts only digits right after "email"/"number"/#
+_NUMBER_WORD_ALT = '|'.join(_WORD_TO_NUM)
+_READ_NUM_RE = re.compile(r'\b(?:(\d+)|(' + _NUMBER_WORD_ALT + r'))\b')
+_DRAFT_NUM_RE = re.compile(
+    r'(?:email|number|mail|#)\s*(\d+)|\b(' + _NUMBER_WORD_ALT + r')\b'
+)
+# "yes"/"confirm" must be whole words ("yesterday" is not a confirmation)
+_SEND_RE = re.compile(
+    r'\b(?:send reply|send it|yes send|send this|send the reply|send that'
+    r'|yes|confirm|go ahead|send now)\b'
+)
+# Prefix match only, so "drafting"/"composing" still count
+_DRAFT_RE = re.compile(
+    r'\b(?:draft|reply to|respond to|write back|write a reply|compose)'
+)
+
+
+def _alternation(phrases) -> str:
+    """Regex matching any of the literal phrases."""
+    return '|'.join(map(re.escape, phrases))
+
+
+# Every command category, found in a single scan by _classify_command
+_COMMAND_KINDS = {
+    'capability': _alternation(_CAPABILITY_TRIGGERS),
+    'security': _alternation(_SECURITY_TRIGGERS),
+    'send': _SEND_RE.pattern,
+    'cancel': 'cancel',
+    'read': r'\bread\b',  # whole word, so "unread" and "already" don't count
+    'not_read': _alternation(_NON_READ_WORDS),
+    'draft': _DRAFT_RE.pattern,
+    'keyword': _alternation(_EMAIL_KEYWORDS),
+    'list': _alternation(_LIST_WORDS),
+}
+# Stops only where some category starts, then tries each one there as a
+# lookahead, so overlapping phrases ("send reply" is also a non-read word)
+# are all recorded
+_CLASSIFIER_RE = re.compile(
+    '(?=' + '|'.join(f'(?:{p})' for p in _COMMAND_KINDS.values()) + ')'
+    + ''.join(f'(?:(?=(?P<{k}>{p}))|)' for k, p in _COMMAND_KINDS.items())
+)
+
+
+def _classify_command(command_lower: str) -> frozenset:
+    """Names of every _COMMAND_KINDS category present in the command."""
+    kinds = set()
+    for match in _CLASSIFIER_RE.finditer(command_lower):
+        kinds.update(k for k, v in match.groupdict().items() if v is not None)
+    return frozenset(kinds)
+
+
+def _discard_task(task: asyncio.Task):
+    """Cancel a speculative task, retrieving its error if it already failed."""
+    task.cancel()
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
+# Words that narrow a listing (sender, topic, time): such commands go to the
+# LLM rather than a fast-path rule that would drop the filter
+_FILTER_WORDS = r'from|about|regarding|since|before|after|last|yesterday|today'
+
+# A sender the fast path can search for on its own: one address or one name
+_SENDER = r'([\w.+-]+@[\w-]+(?:\.[\w-]+)+|[a-z][\w\'-]*)'
+# "from ..." words that aren't senders
+_NOT_SENDER = r'(?!(?:last|this|yesterday|today|earlier|recently|me|my|him|her|them|someone|anyone|everyone)\b)'
+
+# Commands with a fixed tool call, matched locally instead of asking the LLM:
+# (pattern, tool name, params from the match). First match wins. They run on
+# the un-normalized text, so a sender like "to" isn't turned into "2"
+_FAST_PATH_RULES = [
+    (
+        re.compile(rf'^(?!.*\b(?:icloud|{_FILTER_WORDS})\b).*\bunread\b'),
+        "list_gmail_emails",
+        lambda m: {"max_results": 10, "query": "is:unread"},
+    ),
+    (
+        # The sender must end the command; "from john about X" needs the LLM
+        re.compile(
+            r'^(?!.*\b(?:icloud|unread)\b).*?\b(?:find|search|show|get|check)\b'
+            rf'.*?\b(?:emails?|mails?|messages?)\s+from\s+{_NOT_SENDER}{_SENDER}[\s.?!]*$'
+        ),
+        "search_gmail",
+        lambda m: {"query": f"from:{m.group(1)}", "max_results": 5},
+    ),
+    (
+        re.compile(rf'^(?!.*\b(?:icloud|{_FILTER_WORDS})\b).*\b(?:check|show|open|list|get)\b.*\bgmail\b'),
+        "list_gmail_emails",
+        lambda m: {"max_results": 10, "query": "category:primary"},
+    ),
+    (
+        re.compile(rf'^(?!.*\b(?:gmail|{_FILTER_WORDS})\b).*\b(?:check|show|open|list|get)\b.*\bicloud\b'),
+        "list_icloud_emails",
+        lambda m: {"max_results": 10},
+    ),
+]
+
+# MCP tool for each account, looked up instead of formatted per call
+_READ_TOOLS = MappingProxyType({"gmail": "read_gmail_email", "icloud": "read_icloud_email"})
+_SEND_TOOLS = MappingProxyType({"gmail": "send_gmail_email", "icloud": "send_icloud_email"})
+
+# Read-only listings that are safe to start speculatively
+_PREFETCHABLE_TOOLS = frozenset({"list_gmail_emails", "list_icloud_emails"})
+
+# Listings are reused per user for this many seconds (inboxes change on
+# the order of minutes); sending or reading an email invalidates them
+_LIST_CACHE_TOOLS = _PREFETCHABLE_TOOLS | {"list_all_emails"}
+LIST_CACHE_TTL = 30
+
+# LLM decisions for these read-only tools are reused for repeat commands
+# (never sends, which must not be replayed)
+_CACHEABLE_DECISION_TOOLS = _LIST_CACHE_TOOLS | {"search_gmail", "search_icloud"}
+MAX_CACHED_DECISIONS = 512
+# Seconds before a cached decision is asked again (lets prompt tweaks apply)
+DECISION_CACHE_TTL = 3600
+
+# Memory bounds: least recently active users are forgotten first, and only
+# the top of each listing and the latest reads are kept (the list view shows 10)
+MAX_USERS = 10_000
+MAX_EMAIL_LIST = 20
+MAX_READ_EMAILS = 20
+# Users idle this long are dropped from memory (not from the database)
+CONTEXT_IDLE_TTL = 3600
+
+# Optionally re-encode large voice notes before upload (needs ffmpeg)
+COMPRESS_AUDIO = os.getenv("COMPRESS_AUDIO") == "1"
+COMPRESS_MIN_BYTES = 200_000
+
+# Transcripts remembered by audio hash
+MAX_TRANSCRIPTS = 256
+
+# Most Groq requests (chat, Whisper, TTS) in flight at once
+GROQ_CONCURRENCY = int(os.getenv("GROQ_CONCURRENCY", "8"))
+
+# Minimum seconds between edits of a message showing a streamed draft
+PROGRESS_EDIT_INTERVAL = 0.6
+
+# Length of the email body preview shown to the user
+PREVIEW_CHARS = 800
+
+# User context survives restarts in this SQLite file
+CONTEXT_DB_PATH = os.getenv("BOT_CONTEXT_DB", "bot_ctx.db")
+CONTEXT_COMPRESS_LEVEL = 1
+
+# Context keys that only make sense in this process (e.g. asyncio tasks)
+_EPHEMERAL_CTX_KEYS = frozenset({"prefetch", "body_prefetch", "list_cache", "seen"})
+
+# How many bodies to fetch ahead after a listing ("read email 1" is the
+# usual next command)
+PREFETCH_BODIES = 3
+
+# Biases Whisper toward the words our commands actually use
+_WHISPER_PROMPT = (
+    "Check my Gmail, check my iCloud, read email number one, two, three, "
+    "draft a reply, send reply, cancel, inbox, unread."
+)
+
+_REPLY_HINT_RE = re.compile(
+    r'(?:saying|that|message|reply with|respond with|tell them|write)\s+(.+)'
+)
+
+
+# System prompt pieces for the command LLM, joined around the tool list on
+# connect. Static, so it goes before the session context and the provider
+# can reuse the cached prompt prefix
+_PROMPT_HEADER = "You are an email assistant.\n\nAvailable MCP tools:\n"
+
+_PROMPT_RULES = """
+
+RULES:
+- "read email X", "draft reply", "send reply" are handled by the system: action "respond".
+- "check gmail" -> list_gmail_emails {"max_results": 10, "query": "category:primary"}
+- "check icloud" -> list_icloud_emails {"max_results": 10}
+- "find emails from NAME" -> search_gmail {"query": "from:NAME", "max_results": 5}
+
+Reply with one JSON object:
+{"action": "call_tool"|"respond", "tool": "<tool name>", "params": {...}, "message": "<short status for the user>"}"""
+
+_PROMPT_EXAMPLES = """
+
+Examples:
+"check my gmail" -> {"action": "call_tool", "tool": "list_gmail_emails", "params": {"max_results": 10, "query": "category:primary"}, "message": "Fetching Gmail..."}
+"send email to john@x.com saying hello" -> {"action": "call_tool", "tool": "send_gmail_email", "params": {"to": "john@x.com", "subject": "Hello", "body": "hello"}, "message": "Sending..."}
+"read email 1" -> {"action": "respond", "message": "On it!"}"""
+
 
 class EmailBot:
 
@@ -53,80 +357,236 @@ class EmailBot:
         if not self.groq_api_key:
             raise ValueError("GROQ_API_KEY not found in .env")
 
-        self.groq_client = Groq(api_key=self.groq_api_key)
+        # Async client so Whisper/LLM/TTS calls don't block the event loop
+        # (and every other user's updates) while waiting on Groq
+        self.groq_client = AsyncGroq(api_key=self.groq_api_key)
+        # Caps in-flight Groq requests across all users, so bursts queue
+        # here instead of hitting rate limits. The one client above keeps
+        # a single pooled HTTP connection set for every call
+        self._groq_sem = asyncio.Semaphore(GROQ_CONCURRENCY)
         self.mcp_client = None
-
-        # Per-user context memory
-        self.user_context = {}
+        # tool name -> bound call_tool, built on connect
+        self._tool_handles = {}
+
+        # Static system prompt (tools + rules), built on connect
+        self._system_prompt = ""
+
+        # Per-user context memory (LRU, capped at MAX_USERS), backed by
+        # SQLite so it survives restarts
+        self.user_context = OrderedDict()
+        self._db = None
+        # Saves run in order on one worker thread; loads stay on the loop
+        self._db_lock = threading.Lock()
+        self._db_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ctx-db")
+
+        # (user, session context, normalized command) -> (cached_at, safe
+        # tool decision) (LRU with TTL)
+        self._decision_cache = OrderedDict()
+        # Audio hash -> transcript (LRU)
+        self._transcripts = OrderedDict()
 
         logger.info("✅ Email Bot initialized")
 
+    def _new_ctx(self) -> dict:
+        """Fresh per-user context."""
+        return {
+            "email_list": [],
+            "read_emails": {},
+            "pending_draft": None,
+            "last_action_email_num": None,
+        }
+
     def _get_ctx(self, user_id: int) -> dict:
         """Get or create user context."""
-        if user_id not in self.user_context:
-            self.user_context[user_id] = {
-                "email_list": [],
-                "read_emails": {},
-                "pending_draft": None,
-                "last_action_email_num": None,
-            }
-        return self.user_context[user_id]
-
-    def _normalize_command(self, command: str) -> str:
+        now = time.monotonic()
+
+        # Least recently seen users are at the front; drop the idle ones
+        # (their context is reloaded from the database if they come back)
+        while self.user_context:
+            oldest = next(iter(self.user_context.values()))
+            if now - oldest.get("seen", now) < CONTEXT_IDLE_TTL:
+                break
+            self._evict_oldest_ctx()
+
+        ctx = self.user_context.get(user_id)
+        if ctx is None:
+            ctx = self.user_context[user_id] = self._load_ctx(user_id) or self._new_ctx()
+            if len(self.user_context) > MAX_USERS:
+                self._evict_oldest_ctx()
+        else:
+            self.user_context.move_to_end(user_id)
+        ctx["seen"] = now
+        return ctx
+
+    def _evict_oldest_ctx(self):
+        """Forget the least recently seen user and stop their background reads."""
+        _, ctx = self.user_context.popitem(last=False)
+        self._drop_prefetch(ctx)
+        self._drop_body_prefetch(ctx)
+
+    def _remember_read(self, ctx: dict, email_number: int, result: dict):
+        """Store a read email, keeping only the MAX_READ_EMAILS most recent."""
+        # Strip once here; only the short cleaned preview is kept
+        result["body_clean"] = self._strip_html(result.pop("body", ""))
+
+        read_emails = ctx["read_emails"]
+        key = str(email_number)
+        read_emails.pop(key, None)
+        read_emails[key] = result
+        while len(read_emails) > MAX_READ_EMAILS:
+            del read_emails[next(iter(read_emails))]
+        ctx["last_action_email_num"] = key
+
+    def _open_db(self):
+        """Open the context database (WAL mode, so reads don't block writes)."""
+        self._db = sqlite3.connect(CONTEXT_DB_PATH, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # With WAL, NORMAL skips the fsync per commit; a crash can only lose
+        # the last few saves, never corrupt the file
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS ctx (user_id INTEGER PRIMARY KEY, data BLOB)"
+        )
+        self._db.commit()
+
+    def _load_ctx(self, user_id: int):
+        """Load a user's saved context, or None if there isn't one."""
+        if self._db is None:
+            return None
+        try:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT data FROM ctx WHERE user_id = ?", (user_id,)
+                ).fetchone()
+            if row is None:
+                return None
+
+            data = row[0]
+            if isinstance(data, bytes) and not data.startswith(b"{"):
+                # Rows written before compression are plain JSON
+                data = zlib.decompress(data)
+            ctx = {**self._new_ctx(), **_json.loads(data)}
+            if ctx.get("last_intent"):
+                # Stored as a JSON list, compared as a tuple
+                ctx["last_intent"] = tuple(ctx["last_intent"])
+            return ctx
+        except Exception as e:
+            logger.warning(f"⚠️ Couldn't load context for {user_id}: {e}")
+            return None
+
+    async def _save_ctx(self, user_id: int):
         """
-        Normalize transcription quirks.
+        Persist a user's context.
+
+        The context is serialized here, before it can change again; the
+        compression and the SQLite write run on the writer thread.
+        """
+        ctx = self.user_context.get(user_id)
+        if self._db is None or ctx is None:
+            return
+        try:
+            data = _json.dumps(
+                {k: v for k, v in ctx.items() if k not in _EPHEMERAL_CTX_KEYS}
+            )
+            if isinstance(data, str):
+                data = data.encode()
+            await asyncio.get_running_loop().run_in_executor(
+                self._db_writer, self._write_ctx, user_id, data
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Couldn't save context for {user_id}: {e}")
+
+    def _write_ctx(self, user_id: int, data: bytes):
+        """Compress and upsert one saved context (runs on the writer thread)."""
+        # Email text compresses several-fold; level 1 keeps saves cheap
+        data = zlib.compress(data, CONTEXT_COMPRESS_LEVEL)
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO ctx (user_id, data) VALUES (?, ?)",
+                (user_id, data),
+            )
+            self._db.commit()
+
+    def _normalize_command(self, command_lower: str) -> str:
+        """
+        Normalize transcription quirks in an already lowercased command.
         Converts spoken numbers to digits for reliable processing.
         e.g. "read email number two" -> "read email number 2"
         """
-        number_words = {
-            r'\bone\b': '1', r'\btwo\b': '2', r'\bthree\b': '3',
-            r'\bfour\b': '4', r'\bfive\b': '5', r'\bsix\b': '6',
-            r'\bseven\b': '7', r'\beight\b': '8', r'\bnine\b': '9',
-            r'\bten\b': '10', r'\bfirst\b': '1', r'\bsecond\b': '2',
-            r'\bthird\b': '3', r'\bfourth\b': '4', r'\bfifth\b': '5',
-            r'\bsixth\b': '6', r'\bseventh\b': '7', r'\beighth\b': '8',
-            r'\bninth\b': '9', r'\btenth\b': '10',
-            # Common Whisper mishearings
-            r'\bto\b': '2', r'\btoo\b': '2', r'\btu\b': '2',
-            r'\bfor\b': '4', r'\bate\b': '8',
-        }
+        # One pass over the text for all number words
+        result = _NUMBER_WORD_RE.sub(lambda m: _NUMBER_WORDS[m.group(1)], command_lower)
 
-        result = command.lower()
-        for pattern, replacement in number_words.items():
-            result = re.sub(pattern, replacement, result)
-
-        if result != command.lower():
-            logger.info(f"🔄 Normalized: '{command}' -> '{result}'")
+        if result != command_lower:
+            logger.info(f"🔄 Normalized: '{command_lower}' -> '{result}'")
 
         return result
 
     def _strip_html(self, text: str) -> str:
-        """Strip HTML tags from email body."""
+        """
+        Strip HTML tags from email body.
+
+        Walks the body once and stops as soon as there is enough text for
+        the preview, instead of cleaning the whole (often huge) HTML email.
+        """
         if not text:
             return text
-        clean = re.sub(r'<[^>]+>', ' ', text)
-        clean = html.unescape(clean)
-        clean = re.sub(r'\s+', ' ', clean).strip()
-        return clean[:800]
-
-    def _word_to_number(self, word: str) -> int:
-        """Convert word numbers to integers."""
-        word_to_num = {
-            'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5,
-            'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10,
-            'first': 1, 'second': 2, 'third': 3, 'fourth': 4, 'fifth': 5,
-            'sixth': 6, 'seventh': 7, 'eighth': 8, 'ninth': 9, 'tenth': 10
-        }
-        return word_to_num.get(word.lower())
+
+        if '<' not in text:
+            # Plain text: nothing to walk, just clean enough of it. The slice
+            # may cut an entity in half, so leave room past the preview
+            end = PREVIEW_CHARS * 2
+            while True:
+                clean = self._clean_text([text[:end]])
+                if len(clean) >= PREVIEW_CHARS + 40 or end >= len(text):
+                    return clean[:PREVIEW_CHARS]
+                end *= 2
+
+        parts = []
+        size = 0
+        target = PREVIEW_CHARS
+        for match in _HTML_TOKEN_RE.finditer(text):
+            token = match.group()
+            if token[0] == '<' and len(token) > 1 or token.isspace():
+                # Tags and whitespace runs both become a single space
+                parts.append(' ')
+                continue
+
+            parts.append(token)
+            size += len(token)
+            if size >= target:
+                # Entities can shrink when decoded, so check the real length
+                clean = self._clean_text(parts)
+                if len(clean) >= PREVIEW_CHARS:
+                    return clean[:PREVIEW_CHARS]
+                target *= 2
+
+        return self._clean_text(parts)[:PREVIEW_CHARS]
+
+    def _clean_text(self, parts: list) -> str:
+        """Decode entities and collapse whitespace in collected text."""
+        return _WS_RE.sub(' ', html.unescape(''.join(parts))).strip()
+
+    def _clean_body(self, email_data: dict) -> str:
+        """Stripped body of an email, reusing body_clean if it's stored."""
+        if "body_clean" in email_data:
+            return email_data["body_clean"]
+        return self._strip_html(email_data.get("body", ""))
+
+    def _extract_email_number(self, command_lower: str, pattern=_READ_NUM_RE) -> int:
+        """
+        Email number in an already-lowercased command, from one regex pass:
+        digits or a number word ("first"). None if there isn't one.
+        """
+        match = pattern.search(command_lower)
+        if not match:
+            return None
+        digits, word = match.groups()
+        return int(digits) if digits else _WORD_TO_NUM[word]
 
     def _parse_recipient(self, from_header: str) -> str:
         """Extract email address from From header."""
-        email_match = re.search(r'<(.+?)>', from_header)
-        if email_match:
-            return email_match.group(1)
-        if '@' in from_header:
-            return from_header.strip()
-        return from_header.strip()
+        # parseaddr copes with quoted display names, comments, etc.
+        return parseaddr(from_header)[1] or from_header.strip()
 
     def _format_email_list(self, emails: list) -> str:
         """Format email list as plain text."""
@@ -134,22 +594,21 @@ class EmailBot:
             return "You have no emails matching that query."
 
         num_to_show = min(len(emails), 10)
-        text = f"Found {len(emails)} emails. Showing top {num_to_show}:\n\n"
+        parts = [f"Found {len(emails)} emails. Showing top {num_to_show}:\n\n"]
 
         for i, email in enumerate(emails[:num_to_show], 1):
             from_addr = email.get("from", "Unknown")
             subject = email.get("subject", "No subject")
             if len(from_addr) > 40:
                 from_addr = from_addr[:40] + "..."
-            text += f"{i}. From: {from_addr}\n"
-            text += f"   Subject: {subject}\n\n"
+            parts.append(f"{i}. From: {from_addr}\n   Subject: {subject}\n\n")
 
         if len(emails) == 1:
-            text += "Say 'read it' or 'read this email' to read it."
+            parts.append("Say 'read it' or 'read this email' to read it.")
         else:
-            text += "Say 'read email number 1' to read any email."
+            parts.append("Say 'read email number 1' to read any email.")
 
-        return text
+        return "".join(parts)
 
     def _format_email_content(self, email_data: dict) -> str:
         """Format single email content as plain text."""
@@ -158,7 +617,7 @@ class EmailBot:
 
         from_addr = email_data.get('from', 'Unknown')
         subject = email_data.get('subject', 'No subject')
-        body = self._strip_html(email_data.get('body', 'No content'))
+        body = self._clean_body(email_data) or 'No content'
 
         return (
             f"From: {from_addr}\n"
@@ -171,9 +630,14 @@ class EmailBot:
         original_from: str,
         original_subject: str,
         original_body: str,
-        reply_hint: str = ""
+        reply_hint: str = "",
+        on_progress=None
     ) -> str:
-        """Generate professional reply body using Groq."""
+        """
+        Generate professional reply body using Groq.
+        The reply is streamed; on_progress (if given) is awaited with the
+        text so far as it arrives.
+        """
         prompt = f"""Write a professional email reply.
 
 Original email:
@@ -187,13 +651,66 @@ Write ONLY the email body. No subject, no To/From headers.
 Keep it professional, concise and friendly.
 End with: Best regards"""
 
-        response = self.groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7,
-            max_tokens=500,
-        )
-        return response.choices[0].message.content.strip()
+        async with self._groq_sem:
+            stream = await self.groq_client.chat.completions.create(
+                model="llama-3.3-70b-versatile",
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.7,
+                # Short bodies ending in "Best regards" fit comfortably
+                max_tokens=256,
+                stream=True,
+            )
+
+            parts = []
+            async for chunk in stream:
+                piece = chunk.choices[0].delta.content if chunk.choices else None
+                if piece:
+                    parts.append(piece)
+                    if on_progress:
+                        await on_progress("".join(parts))
+
+        return "".join(parts).strip()
+
+    def _progress_editor(self, message):
+        """
+        Build an on_progress callback that shows partial text in a status
+        message, editing at most every PROGRESS_EDIT_INTERVAL seconds
+        (Telegram rate-limits edits).
+
+        The callback only schedules the edit, so the Groq stream (and the
+        semaphore it holds) never waits on Telegram. Edits made while one is
+        in flight collapse into the latest text. Await its flush() before
+        editing the message for anything else.
+        """
+        last_edit = 0.0
+        latest = None
+        sending = None
+
+        async def send():
+            nonlocal latest
+            while latest is not None:
+                text, latest = latest, None
+                try:
+                    await message.edit_text(f"✍️ Drafting...\n\n{text}")
+                except Exception as e:
+                    logger.warning(f"⚠️ Progress edit failed: {e}")
+
+        async def on_progress(text: str):
+            nonlocal last_edit, latest, sending
+            now = time.monotonic()
+            if now - last_edit < PROGRESS_EDIT_INTERVAL:
+                return
+            last_edit = now
+            latest = text
+            if sending is None or sending.done():
+                sending = asyncio.create_task(send())
+
+        async def flush():
+            if sending is not None:
+                await sending
+
+        on_progress.flush = flush
+        return on_progress
 
     def _get_voice_message(self, command_type: str, ctx: dict) -> str:
         """
@@ -311,23 +828,64 @@ End with: Best regards"""
         else:
             return ""
 
-    async def transcribe_voice(self, voice_file_path: str) -> str:
-        """Transcribe voice message using Groq Whisper."""
+    async def transcribe_voice(self, audio: io.BytesIO) -> str:
+        """Transcribe voice message (OGG, in memory) using Groq Whisper."""
         try:
-            logger.info(f"🎤 Transcribing: {voice_file_path}")
-            with open(voice_file_path, "rb") as audio_file:
-                transcription = self.groq_client.audio.transcriptions.create(
-                    file=audio_file,
-                    model="whisper-large-v3",
+            # Forwarded or re-sent voice notes are byte-identical
+            key = hashlib.blake2b(audio.getbuffer(), digest_size=16).digest()
+            cached = self._transcripts.get(key)
+            if cached is not None:
+                self._transcripts.move_to_end(key)
+                logger.info(f"⚡ Transcript cache hit: {cached}")
+                return cached
+
+            if COMPRESS_AUDIO and audio.getbuffer().nbytes > COMPRESS_MIN_BYTES:
+                audio = await asyncio.to_thread(self._compress_audio, audio)
+
+            logger.info(f"🎤 Transcribing: {audio.getbuffer().nbytes} bytes")
+            async with self._groq_sem:
+                transcription = await self.groq_client.audio.transcriptions.create(
+                    file=("voice.ogg", audio, "audio/ogg"),
+                    model="whisper-large-v3-turbo",  # Faster; we only need English
                     language="en",
+                    temperature=0,
+                    prompt=_WHISPER_PROMPT,
                     response_format="text",
                 )
             logger.info(f"✅ Transcription: {transcription}")
+
+            if transcription:
+                self._transcripts[key] = transcription
+                if len(self._transcripts) > MAX_TRANSCRIPTS:
+                    self._transcripts.popitem(last=False)
             return transcription
         except Exception as e:
             logger.error(f"❌ Transcription error: {e}")
             return None
 
+    def _compress_audio(self, audio: io.BytesIO) -> io.BytesIO:
+        """
+        Re-encode a voice note as 16 kHz mono Opus (all Whisper needs) to
+        shrink the upload. Needs ffmpeg; returns the original on failure.
+        """
+        try:
+            from pydub import AudioSegment
+
+            segment = AudioSegment.from_file(audio, format="ogg")
+            out = io.BytesIO()
+            segment.set_channels(1).set_frame_rate(16000).export(
+                out, format="ogg", codec="libopus", bitrate="24k"
+            )
+            out.seek(0)
+            logger.info(
+                f"🗜️ Compressed audio: {audio.getbuffer().nbytes} -> {out.getbuffer().nbytes} bytes"
+            )
+            return out
+        except Exception as e:
+            logger.warning(f"⚠️ Audio compression failed, sending original: {e}")
+            audio.seek(0)
+            return audio
+
     async def text_to_speech(self, text: str) -> str:
         """
         Convert text to speech using Groq TTS (Orpheus).
@@ -346,50 +904,47 @@ End with: Best regards"""
             logger.info(f"🔊 Generating TTS for {len(short_text)} chars")
             
             # Generate speech using Groq Orpheus TTS
-            response = self.groq_client.audio.speech.create(
-                model="canopylabs/orpheus-v1-english",
-                voice="diana",  # Feminine friendly voice
-                input=short_text,
-                response_format="wav"
-            )
+            async with self._groq_sem:
+                response = await self.groq_client.audio.speech.create(
+                    model="canopylabs/orpheus-v1-english",
+                    voice="diana",  # Feminine friendly voice
+                    input=short_text,
+                    response_format="wav"
+                )
             
             # Save to temp file
             with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as f:
-                f.write(response.read())
+                f.write(await response.read())
                 audio_path = f.name
             
             logger.info(f"✅ TTS generated: {audio_path}")
             return audio_path
             
-        except Exception as e:
-            logger.error(f"❌ TTS error: {e}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("❌ TTS failed")
             return None
 
-    async def process_email_command(self, command: str, user_id: int = None):
+    async def process_email_command(self, command: str, user_id: int = None, on_progress=None):
         """
         Process email command through MCP agent.
+        on_progress is passed to the reply drafter to show partial drafts.
         Returns: Tuple of (response_text, command_type)
         """
         try:
             logger.info(f"🧠 Processing: {command}")
             ctx = self._get_ctx(user_id)
 
+            # Lowercased once; sender names are matched on the text as spoken
+            spoken = command.lower().strip()
             # Normalize BEFORE anything else
-            command = self._normalize_command(command)
-            command_lower = command.lower().strip()
+            command = command_lower = self._normalize_command(spoken)
+            # Which branches apply, in one pass; checked below in priority order
+            kinds = _classify_command(command_lower)
 
             # ─────────────────────────────────────────
             # NATURAL Q&A: Capabilities
             # ─────────────────────────────────────────
-            capability_triggers = [
-                'what can you do', 'your skills', 'your capabilities',
-                'what are you able to do', 'help me', 'what do you do',
-                'show me features', 'what features', 'how can you help'
-            ]
-            
-            if any(trigger in command_lower for trigger in capability_triggers):
+            if 'capability' in kinds:
                 response = """🤖 I'M YOUR AI EMAIL ASSISTANT! HERE'S WHAT I CAN DO:
 
 📧 EMAIL MANAGEMENT:
@@ -427,12 +982,7 @@ Ask me about security if you're curious! 🔒"""
             # ─────────────────────────────────────────
             # NATURAL Q&A: Security
             # ─────────────────────────────────────────
-            security_triggers = [
-                'secure', 'safe', 'privacy', 'private', 'data security',
-                'is this safe', 'can i trust', 'security', 'protected'
-            ]
-            
-            if any(trigger in command_lower for trigger in security_triggers):
+            if 'security' in kinds:
                 response = """🔒 YOUR DATA IS COMPLETELY SECURE. HERE'S HOW:
 
 🏠 LOCAL PROCESSING:
@@ -477,20 +1027,16 @@ Your emails = Your privacy. Always. 🛡️"""
             # ─────────────────────────────────────────
             # 1. SEND REPLY - highest priority
             # ─────────────────────────────────────────
-            send_triggers = [
-                'send reply', 'send it', 'yes send', 'send this',
-                'send the reply', 'send that', 'yes', 'confirm',
-                'go ahead', 'send now'
-            ]
-            is_send = any(trigger in command_lower for trigger in send_triggers)
+            is_send = 'send' in kinds
 
             if is_send:
                 if ctx["pending_draft"]:
                     draft = ctx["pending_draft"]
                     account = draft.get("account", "gmail")
-                    send_tool = "send_icloud_email" if account == "icloud" else "send_gmail_email"
+                    send_tool = _SEND_TOOLS.get(account, "send_gmail_email")
 
                     logger.info(f"📤 Sending to {draft['to']} via {send_tool}")
+                    ctx.pop("list_cache", None)
 
                     result = await self.mcp_client.call_tool(
                         send_tool,
@@ -511,7 +1057,7 @@ Your emails = Your privacy. Always. 🛡️"""
             # ─────────────────────────────────────────
             # 2. CANCEL DRAFT
             # ─────────────────────────────────────────
-            if 'cancel' in command_lower:
+            if 'cancel' in kinds:
                 if ctx["pending_draft"]:
                     ctx["pending_draft"] = None
                     return "❌ Draft cancelled.", "cancel_draft"
@@ -520,77 +1066,54 @@ Your emails = Your privacy. Always. 🛡️"""
             # 3. READ EMAIL NUMBER X
             # ─────────────────────────────────────────
             is_read = (
-                'read' in command_lower and
-                not any(w in command_lower for w in ['draft', 'reply', 'respond', 'send'])
+                'read' in kinds and
+                'not_read' not in kinds
             )
 
             if is_read and ctx["email_list"]:
 
-                single_read_triggers = [
-                    'read it', 'read this', 'open it', 'open this',
-                    'read the email', 'read that', 'read the mail'
-                ]
-                is_single_trigger = any(t in command_lower for t in single_read_triggers)
+                is_single_trigger = any(t in command_lower for t in _SINGLE_READ_TRIGGERS)
 
                 if len(ctx["email_list"]) == 1 and (
-                    is_single_trigger or not re.search(r'\b(\d+)\b', command_lower)
+                    is_single_trigger or not _DIGIT_RE.search(command_lower)
                 ):
                     target = ctx["email_list"][0]
                     email_id = target["id"]
-                    account = "icloud" if email_id.isdigit() else "gmail"
-                    read_tool = "read_icloud_email" if account == "icloud" else "read_gmail_email"
+                    account = target["account"]
+                    read_tool = _READ_TOOLS[account]
 
                     logger.info(f"📖 Auto-reading single email: {email_id}")
 
-                    result = await self.mcp_client.call_tool(read_tool, email_id=email_id)
+                    result = await self._read_email(ctx, read_tool, email_id)
 
                     if isinstance(result, dict) and "error" not in result:
                         result["id"] = email_id
                         result["account"] = account
                         result["list_number"] = 1
-                        ctx["read_emails"]["1"] = result
-                        ctx["last_action_email_num"] = "1"
+                        self._remember_read(ctx, 1, result)
                         logger.info(f"💾 Auto-stored: {result.get('subject')}")
 
                     return self._format_email_content(result), "read_email"
 
-                email_number = None
-
-                digit_match = re.search(r'\b(\d+)\b', command_lower)
-                if digit_match:
-                    email_number = int(digit_match.group(1))
-                else:
-                    skip_words = {
-                        'read', 'email', 'number', 'the', 'me', 'please',
-                        'open', 'show', 'get', 'fetch', 'load', 'mail', 'a', 'an'
-                    }
-                    for word in command_lower.split():
-                        if word in skip_words:
-                            continue
-                        num = self._word_to_number(word)
-                        if num:
-                            email_number = num
-                            logger.info(f"🔢 Word number detected: '{word}' -> {num}")
-                            break
+                email_number = self._extract_email_number(command_lower)
 
                 if email_number:
                     email_index = email_number - 1
                     if 0 <= email_index < len(ctx["email_list"]):
                         target = ctx["email_list"][email_index]
                         email_id = target["id"]
-                        account = "icloud" if email_id.isdigit() else "gmail"
-                        read_tool = "read_icloud_email" if account == "icloud" else "read_gmail_email"
+                        account = target["account"]
+                        read_tool = _READ_TOOLS[account]
 
                         logger.info(f"📖 Reading email #{email_number} id={email_id}")
 
-                        result = await self.mcp_client.call_tool(read_tool, email_id=email_id)
+                        result = await self._read_email(ctx, read_tool, email_id)
 
                         if isinstance(result, dict) and "error" not in result:
                             result["id"] = email_id
                             result["account"] = account
                             result["list_number"] = email_number
-                            ctx["read_emails"][str(email_number)] = result
-                            ctx["last_action_email_num"] = str(email_number)
+                            self._remember_read(ctx, email_number, result)
                             logger.info(f"💾 Stored #{email_number}: {result.get('subject')}")
 
                         return self._format_email_content(result), "read_email"
@@ -602,36 +1125,12 @@ Your emails = Your privacy. Always. 🛡️"""
             # ─────────────────────────────────────────
             # 4. DRAFT REPLY
             # ─────────────────────────────────────────
-            draft_triggers = [
-                'draft', 'reply to', 'respond to',
-                'write back', 'write a reply', 'compose'
-            ]
-            is_draft = any(t in command_lower for t in draft_triggers)
+            is_draft = 'draft' in kinds
 
             if is_draft:
-                target_email_num = None
-
-                explicit_match = re.search(
-                    r'(?:email|number|mail|#)\s*(\d+)',
-                    command_lower
-                )
-                if explicit_match:
-                    target_email_num = int(explicit_match.group(1))
+                target_email_num = self._extract_email_number(command_lower, _DRAFT_NUM_RE)
+                if target_email_num:
                     logger.info(f"📝 Explicit number: #{target_email_num}")
-                else:
-                    skip_words = {
-                        'draft', 'reply', 'respond', 'write', 'compose',
-                        'email', 'number', 'mail', 'a', 'an', 'the', 'to',
-                        'for', 'this', 'that', 'my', 'me', 'please'
-                    }
-                    for word in command_lower.split():
-                        if word in skip_words:
-                            continue
-                        num = self._word_to_number(word)
-                        if num:
-                            target_email_num = num
-                            logger.info(f"📝 Word number: #{target_email_num}")
-                            break
 
                 target_email_data = None
 
@@ -652,17 +1151,14 @@ Your emails = Your privacy. Always. 🛡️"""
                     )
 
                 reply_hint = ""
-                hint_match = re.search(
-                    r'(?:saying|that|message|reply with|respond with|tell them|write)\s+(.+)',
-                    command_lower
-                )
+                hint_match = _REPLY_HINT_RE.search(command_lower)
                 if hint_match:
                     reply_hint = hint_match.group(1)
                     logger.info(f"💬 Reply hint: {reply_hint}")
 
                 from_addr = target_email_data.get("from", "")
                 subject = target_email_data.get("subject", "")
-                body = target_email_data.get("body", "")
+                body = self._clean_body(target_email_data)
                 account = target_email_data.get("account", "gmail")
                 recipient = self._parse_recipient(from_addr)
                 reply_subject = subject if subject.lower().startswith('re:') else f"Re: {subject}"
@@ -672,8 +1168,9 @@ Your emails = Your privacy. Always. 🛡️"""
                 reply_body = await self._generate_reply_body(
                     original_from=from_addr,
                     original_subject=subject,
-                    original_body=self._strip_html(body),
-                    reply_hint=reply_hint
+                    original_body=body,
+                    reply_hint=reply_hint,
+                    on_progress=on_progress
                 )
 
                 ctx["pending_draft"] = {
@@ -695,38 +1192,34 @@ Your emails = Your privacy. Always. 🛡️"""
                     f"Say 'send reply' to send or 'cancel' to cancel."
                 ), "draft_reply"
 
+            # ─────────────────────────────────────────
+            # FAST PATH: Obvious commands skip the LLM round trip
+            # ─────────────────────────────────────────
+            for pattern, tool, params_fn in _FAST_PATH_RULES:
+                match = pattern.search(spoken)
+                if match:
+                    params = params_fn(match)
+                    logger.info(f"⚡ Fast path: {tool} {params}")
+
+                    tool_result = await self._call_tool(ctx, tool, params)
+                    handled = self._handle_tool_result(ctx, tool, tool_result)
+                    if handled:
+                        return handled
+                    break
+
             # ─────────────────────────────────────────
             # OFF-TOPIC DETECTION (Before Groq Processing)
             # ─────────────────────────────────────────
-            email_keywords = [
-                'email', 'mail', 'gmail', 'icloud', 'inbox', 'message',
-                'draft', 'reply', 'send', 'read', 'check', 'find', 'search',
-                'list', 'show', 'open', 'fetch', 'get', 'unread'
-            ]
-            
-            has_email_keyword = any(word in command_lower for word in email_keywords)
+            has_email_keyword = 'keyword' in kinds
             
             # If command is long enough and has NO email keywords, it's probably off-topic
             if not has_email_keyword and len(command_lower.split()) >= 3:
                 logger.info(f"🔍 Detected off-topic query: {command_lower}")
-                
-                responses = [
-                    "I'm an email assistant, so I focus on managing your inbox! I can check Gmail and iCloud, read emails, draft replies, and search messages. Try saying 'check my Gmail' to get started!",
-                    "That's outside my expertise! I'm here to help with emails - checking Gmail and iCloud, reading messages, drafting replies, and searching your inbox. Want me to check your emails?",
-                    "I'm not sure about that, but I'm great with emails! I can help you check your Gmail or iCloud, read messages, draft professional replies, and find specific emails. Try saying 'check my Gmail'!",
-                    "I specialize in email management! I can check your Gmail and iCloud accounts, read emails, draft AI-powered replies, and search for specific messages. Need help with your inbox?"
-                ]
-                
-                return random.choice(responses), "off_topic"
+                return random.choice(_OFF_TOPIC_REPLIES), "off_topic"
 
             # ─────────────────────────────────────────
             # 5. NORMAL GROQ PROCESSING
             # ─────────────────────────────────────────
-            tools_desc = "\n".join([
-                f"- {tool.name}: {tool.description}"
-                for tool in self.mcp_client.available_tools
-            ])
-
             context_summary = ""
             if ctx["email_list"]:
                 context_summary += f"Loaded emails: {len(ctx['email_list'])}\n"
@@ -736,126 +1229,245 @@ Your emails = Your privacy. Always. 🛡️"""
             if ctx["pending_draft"]:
                 context_summary += f"Pending draft to: {ctx['pending_draft']['to']}\n"
 
-            system_prompt = f"""You are an email assistant.
+            # The decision depends on the session context ("more from this
+            # sender"), so only the same user repeating a command (modulo
+            # spacing) in the same context can skip the LLM
+            decision_key = (user_id, context_summary, _WS_RE.sub(' ', command_lower))
+            decision = None
+            cached = self._decision_cache.get(decision_key)
+            if cached is not None:
+                cached_at, decision = cached
+                if time.monotonic() - cached_at > DECISION_CACHE_TTL:
+                    del self._decision_cache[decision_key]
+                    decision = None
+
+            if decision is not None:
+                self._decision_cache.move_to_end(decision_key)
+                logger.info(f"⚡ Decision cache hit: {decision_key[2]}")
+            else:
+                # Overlap the likely repeat listing with the LLM round trip
+                if 'list' in kinds and not kinds & {'send', 'cancel', 'draft'}:
+                    self._start_prefetch(ctx)
+
+                # The static system prompt comes first so its prefix is identical
+                # on every request; only the short session context varies
+                async with self._groq_sem:
+                    response = await self.groq_client.chat.completions.create(
+                        model="llama-3.3-70b-versatile",
+                        messages=[
+                            {"role": "system", "content": self._system_prompt},
+                            {"role": "system", "content": "SESSION CONTEXT:\n" + (context_summary or "No emails loaded yet.")},
+                            {"role": "user", "content": command},
+                        ],
+                        temperature=0,
+                        # Most decisions are ~80 tokens, but a composed email
+                        # carries its body; a cut-off reply is invalid JSON.
+                        # JSON mode makes Groq enforce the format
+                        max_tokens=500,
+                        response_format={"type": "json_object"},
+                    )
 
-Available MCP tools:
-{tools_desc}
+                assistant_response = response.choices[0].message.content
+                logger.info(f"🤖 Groq: {assistant_response}")
 
-SESSION CONTEXT:
-{context_summary if context_summary else 'No emails loaded yet.'}
+                try:
+                    decision = _json.loads(assistant_response)
+                except _json.JSONDecodeError:
+                    # JSON mode should make this unreachable; say so if not
+                    logger.warning(f"⚠️ Non-JSON decision from Groq: {assistant_response!r}")
+                    return assistant_response, "unknown"
 
-RULES:
-1. "read email X", "draft reply", "send reply" -> respond with action "respond" (handled by system).
-2. "check gmail" -> list_gmail_emails with query "category:primary" max_results 10.
-3. "check icloud" -> list_icloud_emails max_results 10.
-4. "find emails from NAME" -> search_gmail.
-5. Always return valid JSON only.
+                if (
+                    decision.get("action") == "call_tool"
+                    and decision.get("tool") in _CACHEABLE_DECISION_TOOLS
+                ):
+                    self._decision_cache[decision_key] = (time.monotonic(), decision)
+                    if len(self._decision_cache) > MAX_CACHED_DECISIONS:
+                        self._decision_cache.popitem(last=False)
 
-Response format:
-{{"action": "call_tool" or "respond", "tool": "...", "params": {{}}, "message": "..."}}
+            if decision.get("action") == "call_tool":
+                logger.info(f"🔧 Tool: {decision['tool']}")
 
-Examples:
-"check my gmail" -> {{"action": "call_tool", "tool": "list_gmail_emails", "params": {{"max_results": 10, "query": "category:primary"}}, "message": "Fetching Gmail..."}}
-"check icloud" -> {{"action": "call_tool", "tool": "list_icloud_emails", "params": {{"max_results": 10}}, "message": "Fetching iCloud..."}}
-"find emails from Nike" -> {{"action": "call_tool", "tool": "search_gmail", "params": {{"query": "from:Nike", "max_results": 5}}, "message": "Searching..."}}
-"send email to john@x.com saying hello" -> {{"action": "call_tool", "tool": "send_gmail_email", "params": {{"to": "john@x.com", "subject": "Hello", "body": "hello"}}, "message": "Sending..."}}
-"read email 1" or "draft reply" or "send reply" -> {{"action": "respond", "message": "On it!"}}"""
+                tool_result = await self._call_tool(
+                    ctx, decision["tool"], decision.get("params", {})
+                )
 
-            response = self.groq_client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": command},
-                ],
-                temperature=0.3,
-                max_tokens=1000,
-            )
+                handled = self._handle_tool_result(ctx, decision["tool"], tool_result)
+                if handled:
+                    return handled
 
-            assistant_response = response.choices[0].message.content
-            logger.info(f"🤖 Groq: {assistant_response}")
+            return decision.get("message", "Done!"), "unknown"
 
+        except Exception:
+            logger.exception("❌ process_email_command failed")
+            return "Sorry, something went wrong. Please try again.", "error"
+
+    def _start_prefetch(self, ctx: dict):
+        """
+        Speculatively repeat the user's last listing while their voice
+        message is transcribed or the LLM is deciding. Used by _call_tool
+        if the new command turns out to be the same request.
+        """
+        last_intent = ctx.get("last_intent")
+        if not last_intent or not self.mcp_client:
+            return
+
+        tool, params = last_intent
+        if "prefetch" in ctx or self._cached_list(ctx, tool, params) is not None:
+            return
+
+        logger.info(f"🔮 Prefetching {tool}")
+        ctx["prefetch"] = (
+            last_intent,
+            asyncio.create_task(self.mcp_client.call_tool(tool, **params)),
+        )
+
+    def _drop_prefetch(self, ctx: dict):
+        """Cancel an unused speculative call."""
+        prefetch = ctx.pop("prefetch", None)
+        if prefetch:
+            _discard_task(prefetch[1])
+
+    def _start_body_prefetch(self, ctx: dict):
+        """
+        Start reading the top few emails of a fresh listing in the
+        background. Used by _read_email when the user picks one of them.
+        """
+        # Keep reads already in flight for emails still at the top
+        old = ctx.pop("body_prefetch", {})
+        ctx["body_prefetch"] = {
+            email["id"]: old.pop(email["id"], None) or asyncio.create_task(
+                self.mcp_client.call_tool(_READ_TOOLS[email["account"]], email_id=email["id"])
+            )
+            for email in ctx["email_list"][:PREFETCH_BODIES]
+        }
+        for task in old.values():
+            _discard_task(task)
+
+    def _drop_body_prefetch(self, ctx: dict):
+        """Cancel body reads nobody asked for."""
+        for task in ctx.pop("body_prefetch", {}).values():
+            _discard_task(task)
+
+    async def _read_email(self, ctx: dict, read_tool: str, email_id: str):
+        """Read an email, reusing its prefetched body if there is one."""
+        ctx.pop("list_cache", None)
+        task = ctx.get("body_prefetch", {}).pop(email_id, None)
+        if task:
+            try:
+                result = await task
+            except Exception:
+                result = None
+            # call_tool reports failures as {"error": ...}; retry those fresh
+            if result is not None and not (isinstance(result, dict) and "error" in result):
+                logger.info(f"🔮 Body prefetch hit: {email_id}")
+                return result
+
+        return await self.mcp_client.call_tool(read_tool, email_id=email_id)
+
+    def _cached_list(self, ctx: dict, tool: str, params: dict):
+        """Return a fresh cached listing for this user, or None."""
+        cached = ctx.get("list_cache", {}).get((tool, repr(sorted(params.items()))))
+        if cached and time.monotonic() - cached[0] < LIST_CACHE_TTL:
+            return cached[1]
+        return None
+
+    async def _call_tool(self, ctx: dict, tool: str, params: dict):
+        """
+        Call an MCP tool, reusing a cached listing or a matching prefetch
+        if one is in flight. Remembers successful listings as the user's
+        last intent.
+        """
+        if tool in _LIST_CACHE_TOOLS:
+            cached = self._cached_list(ctx, tool, params)
+            if cached is not None:
+                self._drop_prefetch(ctx)
+                logger.info(f"⚡ List cache hit: {tool}")
+                return cached
+        elif tool.startswith(("send_", "read_")):
+            ctx.pop("list_cache", None)
+
+        prefetch = ctx.pop("prefetch", None)
+        tool_result = None
+
+        if prefetch and prefetch[0] == (tool, params):
             try:
-                decision = json.loads(assistant_response)
+                tool_result = await prefetch[1]
+                logger.info(f"🔮 Prefetch hit: {tool}")
+            except Exception:
+                tool_result = None
+        elif prefetch:
+            _discard_task(prefetch[1])
+
+        if tool_result is None:
+            handle = self._tool_handles.get(tool)
+            if handle is None:
+                return {"error": f"Unknown tool: {tool}"}
+            tool_result = await handle(**params)
+
+        if tool in _PREFETCHABLE_TOOLS and isinstance(tool_result, list):
+            ctx["last_intent"] = (tool, dict(params))
+
+        if tool in _LIST_CACHE_TOOLS and not (
+            isinstance(tool_result, dict) and "error" in tool_result
+        ):
+            ctx.setdefault("list_cache", {})[(tool, repr(sorted(params.items())))] = (
+                time.monotonic(), tool_result
+            )
 
-                if decision.get("action") == "call_tool":
-                    logger.info(f"🔧 Tool: {decision['tool']}")
+        return tool_result
 
-                    tool_result = await self.mcp_client.call_tool(
-                        decision["tool"], **decision.get("params", {})
-                    )
+    def _handle_tool_result(self, ctx: dict, tool: str, tool_result):
+        """
+        Turn a list/search/send tool result into (response_text, command_type),
+        storing any new email list in the user's context.
+        Returns None for results it doesn't recognise.
+        """
+        if tool == "list_all_emails" and isinstance(tool_result, dict) and "error" not in tool_result:
+            # {"gmail": [...], "icloud": [...]} -> one tagged list
+            tool_result = [
+                {**email, "account": account}
+                for account in ("gmail", "icloud")
+                if isinstance(tool_result.get(account), list)
+                for email in tool_result[account]
+            ]
+        elif isinstance(tool_result, list):
+            # Remember which account each email came from, for reading later
+            account = "icloud" if "icloud" in tool else "gmail"
+            for email in tool_result:
+                email["account"] = account
+
+        if isinstance(tool_result, list):
+            if len(tool_result) > 0:
+                ctx["email_list"] = tool_result[:MAX_EMAIL_LIST]
+                ctx["read_emails"] = {}
+                ctx["last_action_email_num"] = None
+                ctx["pending_draft"] = None
+                logger.info(f"💾 New list: {len(tool_result)} emails")
+                self._start_body_prefetch(ctx)
+                
+                if "search" in tool:
+                    command_type = "search_emails"
+                else:
+                    command_type = "list_emails"
+                
+                return self._format_email_list(tool_result), command_type
+            return "No emails found.", "search_emails"
 
-                    if isinstance(tool_result, list):
-                        if len(tool_result) > 0:
-                            ctx["email_list"] = tool_result
-                            ctx["read_emails"] = {}
-                            ctx["last_action_email_num"] = None
-                            ctx["pending_draft"] = None
-                            logger.info(f"💾 New list: {len(tool_result)} emails")
-                            
-                            if "search" in decision['tool']:
-                                command_type = "search_emails"
-                            else:
-                                command_type = "list_emails"
-                            
-                            return self._format_email_list(tool_result), command_type
-                        return "No emails found.", "search_emails"
-
-                    if isinstance(tool_result, dict):
-                        if "error" in tool_result:
-                            return f"Error: {tool_result['error']}", "error"
-                        if tool_result.get("status") == "sent":
-                            return "✅ Email sent!", "send_reply"
-                        return str(tool_result), "unknown"
-
-                return decision.get("message", "Done!"), "unknown"
-
-            except json.JSONDecodeError:
-                return assistant_response, "unknown"
+        if isinstance(tool_result, dict):
+            if "error" in tool_result:
+                return f"Error: {tool_result['error']}", "error"
+            if tool_result.get("status") == "sent":
+                return "✅ Email sent!", "send_reply"
+            return str(tool_result), "unknown"
 
-        except Exception as e:
-            logger.error(f"❌ Error: {e}")
-            import traceback
-            traceback.print_exc()
-            return "Sorry, something went wrong. Please try again.", "error"
+        return None
 
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        await update.message.reply_text(
-            "🤖 AI Email Agent - V4 Final\n\n"
-            "HOW TO USE:\n"
-            "1. Say or type 'check my Gmail' or 'check my iCloud'\n"
-            "2. Say or type 'read email number 1'\n"
-            "3. Say or type 'draft a reply'\n"
-            "4. Say or type 'send reply'\n\n"
-            "✨ I understand natural language!\n\n"
-            "COMMANDS:\n"
-            "/help - All voice commands\n"
-            "/status - See what I remember\n"
-            "/clear - Clear my memory\n\n"
-            "💡 Ask me: 'What can you do?' or 'Is this secure?'"
-        )
+        await update.message.reply_text(_START_MESSAGE)
 
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        await update.message.reply_text(
-            "📖 COMMANDS (voice or text):\n\n"
-            "LISTING:\n"
-            "• 'Check my Gmail'\n"
-            "• 'Check my iCloud'\n\n"
-            "READING:\n"
-            "• 'Read email number 1'\n"
-            "• 'Read it' (when only 1 result)\n\n"
-            "DRAFTING:\n"
-            "• 'Draft a reply'\n"
-            "• 'Draft a reply saying thanks'\n\n"
-            "SENDING:\n"
-            "• 'Send reply'\n"
-            "• 'Cancel'\n\n"
-            "SEARCHING:\n"
-            "• 'Find emails from John'\n\n"
-            "QUESTIONS:\n"
-            "• 'What can you do?'\n"
-            "• 'Is this secure?'\n\n"
-            "💡 I focus on emails - if you ask about something else, I'll gently redirect you back to email tasks!"
-        )
+        await update.message.reply_text(_HELP_MESSAGE)
 
     async def status_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show current bot context/memory for this user."""
@@ -906,17 +1518,48 @@ Examples:
     async def clear_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Clear all context/memory for this user."""
         user_id = update.effective_user.id
-        self.user_context[user_id] = {
-            "email_list": [],
-            "read_emails": {},
-            "pending_draft": None,
-            "last_action_email_num": None,
-        }
+        # A late prefetch would otherwise refill the cleared session
+        ctx = self._get_ctx(user_id)
+        self._drop_prefetch(ctx)
+        self._drop_body_prefetch(ctx)
+        self.user_context[user_id] = self._new_ctx()
+        await self._save_ctx(user_id)
         await update.message.reply_text(
             "🗑️ Memory cleared!\n\n"
             "Start fresh by saying 'check my Gmail'."
         )
 
+    async def _send_response(self, update: Update, processing_msg, ctx: dict,
+                             response_text: str, command_type: str):
+        """
+        Send the text response and, if the command has one, a spoken reply.
+        The text goes out while the speech is still being generated.
+        """
+        text_reply = update.message.reply_text(f"🤖 Response:\n\n{response_text}")
+        voice_message = self._get_voice_message(command_type, ctx)
+
+        if voice_message:
+            _, _, voice_path = await asyncio.gather(
+                text_reply,
+                processing_msg.edit_text("🔊 Generating voice response..."),
+                self.text_to_speech(voice_message),
+            )
+
+            if voice_path:
+                with open(voice_path, 'rb') as audio:
+                    await asyncio.gather(
+                        update.message.reply_voice(voice=audio),
+                        processing_msg.delete(),
+                    )
+                os.unlink(voice_path)
+                logger.info(f"✅ Voice sent: '{voice_message}'")
+            else:
+                logger.warning("⚠️ TTS failed")
+                await processing_msg.delete()
+        else:
+            await asyncio.gather(text_reply, processing_msg.delete())
+            logger.info("ℹ️ No voice message for this command type")
+
     async def handle_voice(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle voice messages from users - V4 Final."""
         user_name = update.effective_user.first_name
@@ -929,16 +1572,24 @@ Examples:
             voice = update.message.voice
             voice_file = await context.bot.get_file(voice.file_id)
 
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".ogg") as temp_file:
-                temp_path = temp_file.name
+            # Download straight into memory - no temp file round trip
+            audio = io.BytesIO()
+            await voice_file.download_to_memory(out=audio)
+            audio.seek(0)
 
-            await voice_file.download_to_drive(temp_path)
-            await processing_msg.edit_text("🔄 Transcribing...")
+            # Users mostly repeat themselves ("check my gmail" again), so
+            # start their last listing while Whisper runs
+            ctx = self._get_ctx(user_id)
+            self._start_prefetch(ctx)
 
-            transcribed_text = await self.transcribe_voice(temp_path)
-            os.unlink(temp_path)
+            # The status edit is just a Telegram RPC - don't wait on it first
+            _, transcribed_text = await asyncio.gather(
+                processing_msg.edit_text("🔄 Transcribing..."),
+                self.transcribe_voice(audio),
+            )
 
             if not transcribed_text:
+                self._drop_prefetch(ctx)
                 await processing_msg.edit_text("❌ Couldn't transcribe. Try again.")
                 return
 
@@ -947,35 +1598,24 @@ Examples:
                 f"✅ Heard: {transcribed_text}\n\n⚙️ Processing..."
             )
 
-            response_text, command_type = await self.process_email_command(
-                transcribed_text, user_id
+            progress = self._progress_editor(processing_msg)
+            try:
+                response_text, command_type = await self.process_email_command(
+                    transcribed_text, user_id, progress
+                )
+            finally:
+                # A late draft preview mustn't overwrite the next status
+                await progress.flush()
+            self._drop_prefetch(ctx)
+            await self._save_ctx(user_id)
+
+            await self._send_response(
+                update, processing_msg, self._get_ctx(user_id), response_text, command_type
             )
 
-            await update.message.reply_text(f"🤖 Response:\n\n{response_text}")
-            
-            ctx = self._get_ctx(user_id)
-            voice_message = self._get_voice_message(command_type, ctx)
-            
-            if voice_message:
-                await processing_msg.edit_text("🔊 Generating voice response...")
-                voice_path = await self.text_to_speech(voice_message)
-                
-                if voice_path:
-                    with open(voice_path, 'rb') as audio:
-                        await update.message.reply_voice(voice=audio)
-                    os.unlink(voice_path)
-                    logger.info(f"✅ Voice sent: '{voice_message}'")
-                else:
-                    logger.warning("⚠️ TTS failed")
-            else:
-                logger.info("ℹ️ No voice message for this command type")
-            
-            await processing_msg.delete()
-
-        except Exception as e:
-            logger.error(f"❌ Error: {e}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            self._drop_prefetch(self._get_ctx(user_id))
+            logger.exception("❌ handle_voice failed")
             await processing_msg.edit_text("❌ Something went wrong. Try again.")
 
     async def handle_text(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -989,33 +1629,24 @@ Examples:
         processing_msg = await update.message.reply_text("⚙️ Processing...")
 
         try:
-            response_text, command_type = await self.process_email_command(text, user_id)
-            
-            await update.message.reply_text(f"🤖 Response:\n\n{response_text}")
-            
-            ctx = self._get_ctx(user_id)
-            voice_message = self._get_voice_message(command_type, ctx)
-            
-            if voice_message:
-                await processing_msg.edit_text("🔊 Generating voice response...")
-                voice_path = await self.text_to_speech(voice_message)
-                
-                if voice_path:
-                    with open(voice_path, 'rb') as audio:
-                        await update.message.reply_voice(voice=audio)
-                    os.unlink(voice_path)
-                    logger.info(f"✅ Voice sent: '{voice_message}'")
-                else:
-                    logger.warning("⚠️ TTS failed")
-            else:
-                logger.info("ℹ️ No voice message for this command type")
+            progress = self._progress_editor(processing_msg)
+            try:
+                response_text, command_type = await self.process_email_command(
+                    text, user_id, progress
+                )
+            finally:
+                # A late draft preview mustn't overwrite the next status
+                await progress.flush()
+            self._drop_prefetch(self._get_ctx(user_id))
+            await self._save_ctx(user_id)
             
-            await processing_msg.delete()
+            await self._send_response(
+                update, processing_msg, self._get_ctx(user_id), response_text, command_type
+            )
 
-        except Exception as e:
-            logger.error(f"❌ Error: {e}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            self._drop_prefetch(self._get_ctx(user_id))
+            logger.exception("❌ handle_text failed")
             await processing_msg.edit_text("❌ Something went wrong. Try again.")
 
     async def error_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -1024,28 +1655,56 @@ Examples:
         if update and update.message:
             await update.message.reply_text("❌ Something went wrong. Please try again.")
 
+    def _on_tools_changed(self, tools):
+        """Rebuild tool handles and the system prompt from the server's tools.
+
+        Runs on every MCP (re)connect, so the prompt is built once per tool
+        list rather than per request.
+        """
+        self._tool_handles = {
+            tool.name: partial(self.mcp_client.call_tool, tool.name)
+            for tool in tools
+        }
+        tools_desc = "\n".join(f"- {tool.name}: {tool.description}" for tool in tools)
+        system_prompt = "".join((_PROMPT_HEADER, tools_desc, _PROMPT_RULES, _PROMPT_EXAMPLES))
+        if system_prompt != self._system_prompt:
+            # Cached routing decisions may name tools that no longer exist
+            self._decision_cache.clear()
+            self._system_prompt = system_prompt
+
     async def connect_mcp_async(self):
         """Connect to MCP server asynchronously."""
         try:
             logger.info("🔌 Connecting to MCP server...")
             self.mcp_client = MCPEmailClient()
-            self.mcp_client = await self.mcp_client.__aenter__()
+            self.mcp_client.on_tools_changed = self._on_tools_changed
+            await self.mcp_client.connect()
             logger.info(f"✅ MCP connected - {len(self.mcp_client.available_tools)} tools")
-        except Exception as e:
-            logger.error(f"❌ MCP connection failed: {e}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("❌ MCP connection failed")
             raise
 
     async def post_init(self, application):
         """Called after application is initialized."""
+        self._open_db()
         await self.connect_mcp_async()
 
+    async def post_shutdown(self, application):
+        """Called when the application stops."""
+        # Let queued saves finish before closing the database
+        self._db_writer.shutdown(wait=True)
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+        await self.groq_client.close()
+        if self.mcp_client:
+            await self.mcp_client.close()
+
     def run(self):
         """Start the bot."""
         logger.info("🚀 Starting Telegram bot V4 Final...")
 
-        app = Application.builder().token(self.token).post_init(self.post_init).build()
+        app = Application.builder().token(self.token).post_init(self.post_init).post_shutdown(self.post_shutdown).build()
 
         app.add_handler(CommandHandler("start", self.start_command))
         app.add_handler(CommandHandler("help", self.help_command))